@@ -7,6 +7,13 @@ Calendar definitions
 
 """
 
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 gregorian_months = {1: 'January', 2: 'February', 3: 'March', 4: 'April',
                     5: 'May', 6: 'June', 7: 'July', 8: 'August',
                     9: 'September', 10: 'October', 11: 'November',
@@ -14,6 +21,21 @@ gregorian_months = {1: 'January', 2: 'February', 3: 'March', 4: 'April',
 
 temperate_seasons = {1: 'Spring', 2: 'Summer', 3: 'Autumn', 4: 'Winter'}
 
+# Cycles and days are precomputed once, calendar functions return these
+# immutable tuples instead of building new lists at each call.
+_MONTHS = tuple(range(1, 13))
+_SEASONS = tuple(range(1, 5))
+_DAYS_IN_MONTHS_365 = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+_DAYS_IN_MONTHS_366 = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+_DAYS_360 = tuple(range(1, 31))
+_DAYS_365 = tuple(tuple(range(1, d + 1)) for d in _DAYS_IN_MONTHS_365)
+_DAYS_366 = tuple(tuple(range(1, d + 1)) for d in _DAYS_IN_MONTHS_366)
+# October 5 to October 14 of 1582 do not exist in the gregorian calendar.
+_OCT_1582 = (1, 2, 3, 4, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27,
+             28, 29, 30, 31)
+_DAYS_1582 = _DAYS_365[:9] + (_OCT_1582,) + _DAYS_365[10:]
+_MONTH_LENGTHS_365 = np.array(_DAYS_IN_MONTHS_365, dtype=np.int8)
+
 
 class CalendarError(Exception):
     pass
@@ -33,7 +55,7 @@ def months_of_gregorian_calendar(year=0):
 
     Returns
     -------
-    out : list of int
+    out : tuple of int
         months of the year.
 
     Notes
@@ -44,10 +66,10 @@ def months_of_gregorian_calendar(year=0):
 
     """
 
-    return list(range(1, 13))
+    return _MONTHS
 
 
-def temperate_seasons(year=0):
+def seasons_of_year(year=0):
     """Temperate seasons.
 
     Parameters
@@ -57,7 +79,7 @@ def temperate_seasons(year=0):
 
     Returns
     -------
-    out : list of int
+    out : tuple of int
         seasons of the year.
 
     Notes
@@ -68,7 +90,7 @@ def temperate_seasons(year=0):
 
     """
 
-    return list(range(1, 5))
+    return _SEASONS
 
 
 def year_cycle(year=0):
@@ -112,7 +134,7 @@ def days_in_month_360(month=0, year=0):
 
     Returns
     -------
-    out : list of int
+    out : tuple of int
         days of the month.
 
     Notes
@@ -123,7 +145,7 @@ def days_in_month_360(month=0, year=0):
 
     """
 
-    return list(range(1, 31))
+    return _DAYS_360
 
 
 def days_in_month_365(month, year=0):
@@ -138,7 +160,7 @@ def days_in_month_365(month, year=0):
 
     Returns
     -------
-    out : list of int
+    out : tuple of int
         days of the month.
 
     Notes
@@ -149,8 +171,7 @@ def days_in_month_365(month, year=0):
 
     """
 
-    days_in_months = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    return list(range(1, days_in_months[month-1] + 1))
+    return _DAYS_365[month-1]
 
 
 def days_in_month_366(month, year=0):
@@ -165,7 +186,7 @@ def days_in_month_366(month, year=0):
 
     Returns
     -------
-    out : list of int
+    out : tuple of int
         days of the month.
 
     Notes
@@ -176,8 +197,7 @@ def days_in_month_366(month, year=0):
 
     """
 
-    days_in_months = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    return list(range(1, days_in_months[month-1] + 1))
+    return _DAYS_366[month-1]
 
 
 def days_in_month_julian(month, year):
@@ -191,7 +211,7 @@ def days_in_month_julian(month, year):
 
     Returns
     -------
-    out : list of int
+    out : tuple of int
         days of the month.
 
     Notes
@@ -219,7 +239,7 @@ def days_in_month_proleptic_gregorian(month, year):
 
     Returns
     -------
-    out : list of int
+    out : tuple of int
         days of the month.
 
     Notes
@@ -249,7 +269,7 @@ def days_in_month_gregorian(month, year):
 
     Returns
     -------
-    out : list of int
+    out : tuple of int
         days of the month.
 
     Notes
@@ -263,13 +283,101 @@ def days_in_month_gregorian(month, year):
 
     """
 
-    if (year > 1582) or ((year == 1582) and (month > 10)):
-        return days_in_month_proleptic_gregorian(month, year)
-    elif (year == 1582) and (month == 10):
-        return [1, 2, 3, 4, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27,
-                28, 29, 30, 31]
-    else:
-        return days_in_month_julian(month, year)
+    return month_table_for_year(year)[month-1]
+
+
+def month_table_for_year(year):
+    """Days of each month of a year (Gregorian calendar).
+
+    Parameters
+    ----------
+    year : int
+
+    Returns
+    -------
+    out : tuple of tuple of int
+        days of each of the 12 months of the year.
+
+    Notes
+    -----
+    The leap year and 1582 checks are done once for the whole year, which
+    is useful when iterating over all the months of a given year.
+
+    """
+
+    if year > 1582:
+        if _is_leap_gregorian(year, None):
+            return _DAYS_366
+        return _DAYS_365
+    elif year == 1582:
+        return _DAYS_1582
+    elif (year & 3) == 0:
+        return _DAYS_366
+    return _DAYS_365
+
+
+def days_in_month_gregorian_vec(months, years):
+    """Number of days of the months (Gregorian calendar), on arrays.
+
+    Parameters
+    ----------
+    months : array_like of int
+        numerical values of the months (1 to 12).
+    years : array_like of int
+
+    Returns
+    -------
+    out : numpy.ndarray of int8
+        number of days in each (month, year) pair.
+
+    Notes
+    -----
+    Vectorized counterpart of :func:`days_in_month_gregorian`, returning
+    the number of days instead of the days themselves.
+
+    """
+
+    months = np.asarray(months)
+    years = np.asarray(years, dtype=np.int64)
+    months, years = np.broadcast_arrays(months, years)
+    out = _MONTH_LENGTHS_365[months - 1]
+    leap = _leap_standard_arr(years.ravel()).reshape(years.shape)
+    # np.where rather than assignments, for scalar (0-d) inputs
+    out = np.where(leap & (months == 2), out + 1, out)
+    out = np.where((years == 1582) & (months == 10), 21, out)
+    return out.astype(np.int8)
+
+
+def _month_length_360(month=0, year=0):
+    return 30
+
+
+def _month_length_365(month, year=0):
+    return _DAYS_IN_MONTHS_365[month-1]
+
+
+def _month_length_366(month, year=0):
+    return _DAYS_IN_MONTHS_366[month-1]
+
+
+def _month_length_julian(month, year):
+    if (year & 3) == 0:
+        return _DAYS_IN_MONTHS_366[month-1]
+    return _DAYS_IN_MONTHS_365[month-1]
+
+
+def _month_length_proleptic_gregorian(month, year):
+    if _is_leap_gregorian(year, None):
+        return _DAYS_IN_MONTHS_366[month-1]
+    return _DAYS_IN_MONTHS_365[month-1]
+
+
+def _month_length_gregorian(month, year):
+    if (year == 1582) and (month == 10):
+        return 21
+    if _is_leap_standard(year, None):
+        return _DAYS_IN_MONTHS_366[month-1]
+    return _DAYS_IN_MONTHS_365[month-1]
 
 
 def days_in_year_365(cycle=0, year=0):
@@ -353,6 +461,92 @@ def is_leap_feb29(year, calendar):
         return False
 
 
+def _never_leap(year, calendar):
+    """Leap year check for calendars without leap years."""
+
+    return False
+
+
+def _always_leap(year, calendar):
+    """Leap year check for calendars where every year is a leap year."""
+
+    return True
+
+
+def _is_leap_julian(year, calendar):
+    """Leap year check (every 4 years)."""
+
+    return (year & 3) == 0
+
+
+def _is_leap_gregorian(year, calendar):
+    """Leap year check (every 4 years, except every 100 but every 400)."""
+
+    return (year & 3) == 0 and ((year % 100) != 0 or (year % 400) == 0)
+
+
+def _is_leap_standard(year, calendar):
+    """Leap year check (Gregorian, transition to Julian before 1582)."""
+
+    if year > 1582:
+        return (year & 3) == 0 and ((year % 100) != 0 or (year % 400) == 0)
+    return (year & 3) == 0
+
+
+##############################
+# Leap year check on arrays  #
+##############################
+
+# Integer codes of the built-in calendars for the array kernels.
+_CODE_360 = 0
+_CODE_365 = 1
+_CODE_366 = 2
+_CODE_JULIAN = 3
+_CODE_PROLEPTIC = 4
+_CODE_GREGORIAN = 5
+
+
+def _leap_julian_arr(years):
+    return (years & 3) == 0
+
+
+def _leap_gregorian_arr(years):
+    return ((years & 3) == 0) & (((years % 100) != 0) | ((years % 400) == 0))
+
+
+def _leap_standard_arr(years):
+    return np.where(years > 1582, _leap_gregorian_arr(years),
+                    _leap_julian_arr(years))
+
+
+def _days_in_year_arr(years, calendar_code):
+    if calendar_code == _CODE_360:
+        return np.full(years.size, 360, np.int64)
+    elif calendar_code == _CODE_365:
+        return np.full(years.size, 365, np.int64)
+    elif calendar_code == _CODE_366:
+        return np.full(years.size, 366, np.int64)
+    elif calendar_code == _CODE_JULIAN:
+        leap = _leap_julian_arr(years)
+    elif calendar_code == _CODE_PROLEPTIC:
+        leap = _leap_gregorian_arr(years)
+    else:
+        leap = _leap_standard_arr(years)
+    out = leap.astype(np.int64) + 365
+    if calendar_code == _CODE_GREGORIAN:
+        out[years == 1582] = 355
+    return out
+
+
+# The kernels above are plain NumPy expressions, they are compiled with
+# numba when it is available.
+if njit is not None:
+    _leap_julian_arr = njit(cache=True)(_leap_julian_arr)
+    _leap_gregorian_arr = njit(cache=True)(_leap_gregorian_arr)
+    _leap_standard_arr = njit(cache=True)(_leap_standard_arr)
+    _days_in_year_arr = njit(cache=True)(_days_in_year_arr)
+
+
 class Calendar:
     """Calendar definition.
 
@@ -362,7 +556,8 @@ class Calendar:
 
     """
 
-    def __init__(self, alias, cycles_in_year, days_in_cycle, fn_is_leap=None):
+    def __init__(self, alias, cycles_in_year, days_in_cycle, fn_is_leap=None,
+                 length_in_cycle=None):
         """Initialize calendar.
 
         Parameters
@@ -377,6 +572,9 @@ class Calendar:
             returns a list of the days in the cycle.
         fn_is_leap : function(year,calendar), optional
             returns True for leap years, False otherwise.
+        length_in_cycle : function(cycle,year), optional
+            returns the number of days in the cycle, used instead of
+            days_in_cycle when only the count is needed.
 
         """
 
@@ -384,21 +582,23 @@ class Calendar:
         self.cycles_in_year = cycles_in_year
         self.days_in_cycle = days_in_cycle
         self.fn_is_leap = fn_is_leap
+        self.length_in_cycle = length_in_cycle
+        # Number of days in a year, keyed on the leap year flag. Kept per
+        # instance since calendars with the same alias may differ.
+        self._year_length_cache = {}
 
     def __str__(self):
         return self.alias
 
     def __eq__(self, other):
-        if self.alias == other.alias:
-            return True
-        else:
-            return False
+        return (self is other) or \
+            (isinstance(other, Calendar) and (self.alias == other.alias))
 
     def __ne__(self, other):
-        if self.alias != other.alias:
-            return True
-        else:
-            return False
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.alias)
 
     def is_leap(self, year):
         """Check if a given year is a leap year.
@@ -418,10 +618,38 @@ class Calendar:
             warp = (self.alias,)
             msg = "Leap year concept not defined for '%s' calendar." % warp
             raise CalendarError(msg)
-        if self.fn_is_leap(year, self):
-            return True
-        else:
-            return False
+        return bool(self.fn_is_leap(year, self))
+
+    def is_leap_array(self, years):
+        """Check which years of an array are leap years.
+
+        Parameters
+        ----------
+        years : array_like of int
+
+        Returns
+        -------
+        out : numpy.ndarray of bool
+            True for leap years, False otherwise.
+
+        """
+
+        if self.fn_is_leap is None:
+            warp = (self.alias,)
+            msg = "Leap year concept not defined for '%s' calendar." % warp
+            raise CalendarError(msg)
+        years = np.asarray(years, dtype=np.int64)
+        kernel = _LEAP_ARRAY_KERNELS.get(self.fn_is_leap)
+        if kernel is not None:
+            return kernel(years.ravel()).reshape(years.shape)
+        if self.fn_is_leap is _never_leap:
+            return np.zeros(years.shape, dtype=bool)
+        if self.fn_is_leap is _always_leap:
+            return np.ones(years.shape, dtype=bool)
+        out = np.fromiter((self.fn_is_leap(int(year), self)
+                           for year in years.ravel()),
+                          dtype=bool, count=years.size)
+        return out.reshape(years.shape)
 
     def count_cycles_in_year(self, year):
         """Count the number of cycles in a year.
@@ -454,6 +682,8 @@ class Calendar:
 
         """
 
+        if self.length_in_cycle is not None:
+            return self.length_in_cycle(cycle, year)
         return len(self.days_in_cycle(cycle, year))
 
     def count_days_in_year(self, year):
@@ -470,10 +700,50 @@ class Calendar:
 
         """
 
+        if self.days_in_cycle is days_in_month_365:
+            return 365
+        # The year length only depends on whether it is a leap year, except
+        # for the gregorian year 1582 where October is shortened.
+        if (self.fn_is_leap is None) or \
+           ((self.alias == 'gregorian') and (year == 1582)):
+            return self._sum_days_in_cycles(year)
+        key = self.fn_is_leap(year, self)
+        try:
+            return self._year_length_cache[key]
+        except KeyError:
+            days_in_year = self._sum_days_in_cycles(year)
+            self._year_length_cache[key] = days_in_year
+            return days_in_year
+
+    def count_days_in_year_array(self, years):
+        """Count the number of days in each year of an array.
+
+        Parameters
+        ----------
+        years : array_like of int
+
+        Returns
+        -------
+        out : numpy.ndarray of int
+            number of days in each year.
+
+        """
+
+        years = np.asarray(years, dtype=np.int64)
+        calendar_code = _CALENDAR_CODES.get(self.alias)
+        if calendar_code is not None:
+            out = _days_in_year_arr(years.ravel(), calendar_code)
+            return out.reshape(years.shape)
+        out = np.fromiter((self.count_days_in_year(int(year))
+                           for year in years.ravel()),
+                          dtype=np.int64, count=years.size)
+        return out.reshape(years.shape)
+
+    def _sum_days_in_cycles(self, year):
         year_cycles = self.cycles_in_year(year)
         days_in_year = 0
         for cycle in year_cycles:
-            days_in_year += len(self.days_in_cycle(cycle, year))
+            days_in_year += self.count_days_in_cycle(cycle, year)
         return days_in_year
 
 ######################
@@ -481,23 +751,52 @@ class Calendar:
 ######################
 
 Cal360 = Calendar('360_day', months_of_gregorian_calendar, days_in_month_360,
-                  is_leap_feb29)
+                  _never_leap, _month_length_360)
 Cal365 = Calendar('noleap', months_of_gregorian_calendar, days_in_month_365,
-                  is_leap_feb29)
+                  _never_leap, _month_length_365)
 Cal366 = Calendar('all_leap', months_of_gregorian_calendar, days_in_month_366,
-                  is_leap_feb29)
+                  _always_leap, _month_length_366)
 CalJulian = Calendar('julian', months_of_gregorian_calendar,
-                     days_in_month_julian, is_leap_feb29)
+                     days_in_month_julian, _is_leap_julian,
+                     _month_length_julian)
 CalProleptic = Calendar('proleptic_gregorian', months_of_gregorian_calendar,
-                        days_in_month_proleptic_gregorian, is_leap_feb29)
+                        days_in_month_proleptic_gregorian, _is_leap_gregorian,
+                        _month_length_proleptic_gregorian)
 CalGregorian = Calendar('gregorian', months_of_gregorian_calendar,
-                        days_in_month_gregorian, is_leap_feb29)
-CalYearsOnly = Calendar('years_only', year_cycle, day_in_year, is_leap_feb29)
+                        days_in_month_gregorian, _is_leap_standard,
+                        _month_length_gregorian)
+CalYearsOnly = Calendar('years_only', year_cycle, day_in_year, _never_leap)
 CalMonthsOnly = Calendar('months_only', months_of_gregorian_calendar,
                          day_in_year)
-CalSeasons = Calendar('seasons', temperate_seasons, day_in_year)
+CalSeasons = Calendar('seasons', seasons_of_year, day_in_year)
 Cal365NoMonths = Calendar('365_days_no_months', year_cycle, days_in_year_365)
 
+# Mapping from the calendars of the CF conventions to built-in calendars.
+_CAL_BY_ALIAS = {'360_day': Cal360,
+                 'noleap': Cal365,
+                 '365_day': Cal365,
+                 'all_leap': Cal366,
+                 '366_day': Cal366,
+                 'julian': CalJulian,
+                 'proleptic_gregorian': CalProleptic,
+                 'gregorian': CalGregorian,
+                 'standard': CalGregorian,
+                 'years_only': CalYearsOnly,
+                 'months_only': CalMonthsOnly,
+                 'seasons': CalSeasons,
+                 '365_days_no_months': Cal365NoMonths}
+
+_CALENDAR_CODES = {'360_day': _CODE_360,
+                   'noleap': _CODE_365,
+                   'all_leap': _CODE_366,
+                   'julian': _CODE_JULIAN,
+                   'proleptic_gregorian': _CODE_PROLEPTIC,
+                   'gregorian': _CODE_GREGORIAN}
+
+_LEAP_ARRAY_KERNELS = {_is_leap_julian: _leap_julian_arr,
+                       _is_leap_gregorian: _leap_gregorian_arr,
+                       _is_leap_standard: _leap_standard_arr}
+
 
 def calendar_from_alias(calendar_alias):
     """Get a Calendar object from its alias.
@@ -517,25 +816,7 @@ def calendar_from_alias(calendar_alias):
 
     """
 
-    if calendar_alias == '360_day':
-        return Cal360
-    elif calendar_alias in ['noleap', '365_day']:
-        return Cal365
-    elif calendar_alias in ['all_leap', '366_day']:
-        return Cal366
-    elif calendar_alias == 'julian':
-        return CalJulian
-    elif calendar_alias == 'proleptic_gregorian':
-        return CalProleptic
-    elif calendar_alias in ['gregorian', 'standard']:
-        return CalGregorian
-    elif calendar_alias == 'years_only':
-        return CalYearsOnly
-    elif calendar_alias == 'months_only':
-        return CalMonthsOnly
-    elif calendar_alias == 'seasons':
-        return CalSeasons
-    elif calendar_alias == '365_days_no_months':
-        return Cal365NoMonths
-    else:
+    try:
+        return _CAL_BY_ALIAS[calendar_alias]
+    except KeyError:
         raise CalendarError("Unknown calendar: %s." % (calendar_alias,))
@@ -9,21 +9,71 @@ A localhost Solr index can be launched with docker::
 
 """
 
-import os
+import re
+import collections
 import copy
+import itertools
 import json
 import requests
 import logging
-from urllib.parse import urlparse
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import quote, urlencode, urlparse
 
 import threddsclient
 import netCDF4
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from . import nctime
 from . import netcdfcookie
 
 logger = logging.getLogger(__name__)
 
+# HTTP session shared by all Solr requests, keeping the connections alive
+# between calls. Idempotent requests are retried on connection errors.
+_session = requests.Session()
+_http_adapter = HTTPAdapter(
+    pool_connections=16, pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.2))
+_session.mount('http://', _http_adapter)
+_session.mount('https://', _http_adapter)
+
+# Solr requests and responses are (de)serialized with orjson if available.
+if orjson is not None:
+    def _json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    _json_loads = orjson.loads
+else:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+# Names of the fields in the schema of each Solr server, see
+# solr_schema_fields.
+_schema_fields_cache = {}
+
+# Raw pavicsearch responses by search url, as (time, content), see the
+# cache_timeout parameter of pavicsearch. Cleared when Solr commits.
+_search_cache = {}
+_search_cache_size = 256
+
+
+# Solr query syntax characters, the * and ? wildcards are left out
+_solr_special_chars = re.compile(r'[\s+\-&|!(){}\[\]^"~:\\/]')
+
+# Facet values that pavicsvalidate considers missing
+_missing_facet_values = frozenset(['', '_undefined'])
+
+# Fields read by restructure_type for each search_type
+_search_type_fields = {'Dataset': ['dataset_id'],
+                       'Aggregate': ['dataset_id', 'title', 'url',
+                                     'opendap_url'],
+                       'FileAsAggregate': ['title']}
 
 # These definitions should be moved to a config file
 solr_fields_type = {'datetime_max': 'date',
@@ -68,28 +118,20 @@ class MissingThreddsFile(Exception):
     pass
 
 
+def _url_join(base, *parts):
+    # Join url parts with '/', os.path.join would use the OS separator.
+    if not base.endswith('/'):
+        base += '/'
+    return base + '/'.join(parts)
+
+
 def _modify_wms_url(thredds_dataset, wms_alternate_server=None):
-    wms_url = thredds_dataset.wms_url()
-    if wms_alternate_server is not None:
-        thredds_id = thredds_dataset.ID
-        thredds_rel_path = thredds_id[thredds_id.find('/') + 1:]
-        wms_url = wms_alternate_server.replace('<DATASET>', thredds_rel_path)
-    return wms_url
-
-
-def _split_solr_update(solr_server, add_data, split_update=None):
-    if split_update:
-        previous_update = None
-        for i in range(0, len(add_data), split_update):
-            update_result = solr_update(
-                solr_server, add_data[i:i + split_update])
-            if i > 0:
-                update_result = aggregate_solr_responses(
-                    previous_update, update_result)
-            previous_update = update_result
-        return update_result
-    else:
-        return solr_update(solr_server, add_data)
+    # The thredds wms url is only built when it is not replaced.
+    if wms_alternate_server is None:
+        return thredds_dataset.wms_url()
+    thredds_id = thredds_dataset.ID
+    thredds_rel_path = thredds_id[thredds_id.find('/') + 1:]
+    return wms_alternate_server.replace('<DATASET>', thredds_rel_path)
 
 
 def solr_add_field(solr_server, field_name, field_type='string',
@@ -111,7 +153,7 @@ def solr_add_field(solr_server, field_name, field_type='string',
 
     """
 
-    schema_path = os.path.join(solr_server, 'schema')
+    schema_path = _url_join(solr_server, 'schema')
     if multivalued:
         add_field = {'add-field': {'name': field_name,
                                    'type': field_type,
@@ -122,18 +164,21 @@ def solr_add_field(solr_server, field_name, field_type='string',
                                    'type': field_type,
                                    'stored': 'true'}}
     headers = {'Content-type': 'application/json'}
-    r = requests.post(schema_path, data=json.dumps(add_field), headers=headers)
-    return r.json()
+    r = _session.post(schema_path, data=_json_dumps(add_field),
+                      headers=headers)
+    invalidate_schema_cache(solr_server)
+    return _json_loads(r.content)
 
 
-def solr_update(solr_server, update_data):
-    """Update data in a Solr database.
+def solr_add_fields(solr_server, fields):
+    """Add multiple fields in a Solr database with a single request.
 
     Parameters
     ----------
     solr_server : string
         usually of the form 'http://x.x.x.x:8983/solr/core_name/'
-    update_data : list of dict
+    fields : list of dict
+        field definitions, e.g. {'name': ..., 'type': ..., 'stored': 'true'}
 
     Returns
     -------
@@ -142,39 +187,177 @@ def solr_update(solr_server, update_data):
 
     """
 
-    # make sure update_data is a list
-    if not hasattr(update_data, 'append'):
-        update_data = [update_data]
+    schema_path = _url_join(solr_server, 'schema')
+    headers = {'Content-type': 'application/json'}
+    r = _session.post(schema_path, data=_json_dumps({'add-field': fields}),
+                      headers=headers)
+    if not r.ok:
+        invalidate_schema_cache(solr_server)
+        r.raise_for_status()
+    return _json_loads(r.content)
+
+
+def solr_schema_fields(solr_server):
+    """Names of the fields in a Solr database schema.
+
+    Parameters
+    ----------
+    solr_server : string
+        usually of the form 'http://x.x.x.x:8983/solr/core_name/'
+
+    Returns
+    -------
+    out : set of string
+
+    Notes
+    -----
+    1. The schema is only fetched once per Solr server, the same set is
+       returned afterwards and is kept up to date by solr_update.
+       Use invalidate_schema_cache if the schema is modified otherwise.
+
+    """
+
+    if solr_server not in _schema_fields_cache:
+        solr_call = _url_join(solr_server, 'schema', 'fields?wt=json')
+        r = _session.get(solr_call)
+        if not r.ok:
+            r.raise_for_status()
+        _schema_fields_cache[solr_server] = set(
+            field['name'] for field in _json_loads(r.content)['fields'])
+    return _schema_fields_cache[solr_server]
+
+
+def invalidate_schema_cache(solr_server):
+    """Forget the cached schema fields of a Solr database.
+
+    Parameters
+    ----------
+    solr_server : string
+        usually of the form 'http://x.x.x.x:8983/solr/core_name/'
+
+    """
+
+    _schema_fields_cache.pop(solr_server, None)
+
 
-    # search for fields that do not yet exist in Solr and add them
-    solr_call = os.path.join(solr_server, 'schema', 'fields?wt=json')
-    r = requests.get(solr_call)
+def solr_commit(solr_server):
+    """Commit pending updates in a Solr database.
+
+    Parameters
+    ----------
+    solr_server : string
+        usually of the form 'http://x.x.x.x:8983/solr/core_name/'
+
+    Returns
+    -------
+    out : string
+        json response from the Solr server
+
+    """
+
+    solr_call = _url_join(solr_server, 'update')
+    headers = {'Content-type': 'application/json'}
+    r = _session.post(solr_call, data=_json_dumps({'commit': {}}),
+                      headers=headers)
+    _search_cache.clear()
     if not r.ok:
         r.raise_for_status()
-    solr_fields = r.json()
-    list_of_fields = []
-    for field in solr_fields['fields']:
-        list_of_fields.append(field['name'])
-    for one_update in update_data:
-        for field in one_update:
-            if field not in list_of_fields:
-                if hasattr(one_update[field], 'append'):
-                    multivalued = True
-                else:
-                    multivalued = False
-                field_type = solr_fields_type.get(field, 'string')
-                solr_add_field(solr_server, field, field_type=field_type,
-                               multivalued=multivalued)
-                list_of_fields.append(field)
-
-    # add data to solr
-    solr_call = os.path.join(solr_server, 'update', 'json?commit=true')
-    solr_json_input = json.dumps(update_data)
+    return _json_loads(r.content)
+
+
+def _solr_post_update(solr_server, update_data):
+    # Post documents to Solr without committing them.
+    solr_call = _url_join(solr_server, 'update', 'json?commit=false')
     headers = {'Content-type': 'application/json'}
-    r = requests.post(solr_call, data=solr_json_input, headers=headers)
+    r = _session.post(solr_call, data=_json_dumps(update_data),
+                      headers=headers)
     if not r.ok:
+        # the failure may come from a stale schema
+        invalidate_schema_cache(solr_server)
         r.raise_for_status()
-    update_result = r.json()
+    return _json_loads(r.content)
+
+
+def _solr_add_missing_fields(solr_server, update_data, schema_fields):
+    # Search for fields of update_data that do not yet exist in Solr and add
+    # them, all in a single schema request. schema_fields is updated.
+    new_fields = []
+    for one_update in update_data:
+        for field in one_update:
+            if field not in schema_fields:
+                value = one_update[field]
+                # atomic update, e.g. {'set': value}
+                if isinstance(value, dict):
+                    value = value.get('set')
+                new_field = {'name': field,
+                             'type': solr_fields_type.get(field, 'string'),
+                             'stored': 'true'}
+                if isinstance(value, list):
+                    new_field['multiValued'] = 'true'
+                new_fields.append(new_field)
+                schema_fields.add(field)
+    if new_fields:
+        solr_add_fields(solr_server, new_fields)
+
+
+def solr_update(solr_server, update_data, commit=True, batch_size=500,
+                schema_fields=None, max_workers=4):
+    """Update data in a Solr database.
+
+    Parameters
+    ----------
+    solr_server : string
+        usually of the form 'http://x.x.x.x:8983/solr/core_name/'
+    update_data : list of dict
+    commit : bool
+        if True, commit once after all the batches have been posted
+    batch_size : int
+        how many documents are posted per request, None to post them all
+        in a single request
+    schema_fields : set of string
+        fields already in the Solr schema, solr_schema_fields(solr_server)
+        if not provided. Fields added by this call are also added to this
+        set.
+    max_workers : int
+        number of batches posted concurrently
+
+    Returns
+    -------
+    out : string
+        json response from the Solr server
+
+    """
+
+    # make sure update_data is a list
+    if not hasattr(update_data, 'append'):
+        update_data = [update_data]
+
+    if schema_fields is None:
+        schema_fields = solr_schema_fields(solr_server)
+    _solr_add_missing_fields(solr_server, update_data, schema_fields)
+
+    # add data to solr, the batches are posted concurrently and the commit
+    # is deferred until all of them are posted
+    if not batch_size:
+        batch_size = max(len(update_data), 1)
+    batches = [update_data[i:i + batch_size]
+               for i in range(0, max(len(update_data), 1), batch_size)]
+    if len(batches) == 1:
+        responses = [_solr_post_update(solr_server, batches[0])]
+    else:
+        with ThreadPoolExecutor(
+                max_workers=min(max_workers, len(batches))) as executor:
+            responses = list(executor.map(
+                lambda batch: _solr_post_update(solr_server, batch),
+                batches))
+    update_result = responses[0]
+    for response in responses[1:]:
+        update_result = aggregate_solr_responses(update_result, response,
+                                                 inplace=True)
+    if commit:
+        update_result = aggregate_solr_responses(update_result,
+                                                 solr_commit(solr_server),
+                                                 inplace=True)
     return update_result
 
 
@@ -199,21 +382,136 @@ def solr_delete(solr_server, delete_ids):
         delete_ids = [delete_ids]
 
     # delete data in solr
-    solr_call = os.path.join(solr_server, 'update?commit=true')
-    solr_json_input = json.dumps({'delete': delete_ids})
+    solr_call = _url_join(solr_server, 'update?commit=true')
+    solr_json_input = _json_dumps({'delete': delete_ids})
     headers = {'Content-type': 'application/json'}
-    r = requests.post(solr_call, data=solr_json_input, headers=headers)
+    r = _session.post(solr_call, data=solr_json_input, headers=headers)
+    _search_cache.clear()
     if not r.ok:
         r.raise_for_status()
-    delete_result = r.json()
+    delete_result = _json_loads(r.content)
     return delete_result
 
 
+def _thredds_dataset_doc(thredds_dataset, thredds_server, set_dataset_id,
+                         wms_alternate_server):
+    # Catalog entry of a single THREDDS dataset, from the THREDDS metadata
+    # only (the NetCDF file is not opened).
+    wms_url = _modify_wms_url(thredds_dataset, wms_alternate_server)
+    urls = {'opendap_url': thredds_dataset.opendap_url(),
+            'download_url': thredds_dataset.download_url(),
+            'thredds_server': thredds_server,
+            'catalog_url': thredds_dataset.catalog.url,
+            'wms_url': wms_url}
+
+    # Default Birdhouse catalog entry
+    # 'url' is used differently in the ESGF database, adding
+    # 'fileserver_url' and will possibly use 'url' as in the ESGF
+    # implementation
+    doc = {'url': urls['download_url'],
+           'fileserver_url': urls['download_url'],
+           'source': _url_join(urls['thredds_server'], 'catalog.xml'),
+           'catalog_url': "{0}?dataset={1}".format(
+               urls['catalog_url'], thredds_dataset.ID),
+           'category': 'thredds',
+           'content_type': thredds_dataset.content_type,
+           'opendap_url': urls['opendap_url'],
+           'title': thredds_dataset.name,
+           'last_modified': thredds_dataset.modified,
+           'wms_url': urls['wms_url'],
+           'resourcename': thredds_dataset.url_path,
+           'subject': 'Birdhouse Thredds Catalog',
+           'type': 'File'}
+
+    # Set default dataset_id
+    if set_dataset_id:
+        doc['dataset_id'] = '.'.join(
+            doc['resourcename'].split('/')[1:-1])
+    return doc
+
+
+def _add_netcdf_metadata(doc, index_facets_did, ignored_variables):
+    # Complete a catalog entry with the NetCDF metadata, returns None if
+    # the NetCDF file cannot be opened. This runs in worker processes, so
+    # it only receives and returns picklable objects.
+
+    # Here, if opening the NetCDF file fails, we simply continue
+    # to the next one. Perhaps a way to track the erroneous files
+    # should be considered...
+    try:
+        nc = netCDF4.Dataset(doc['opendap_url'], 'r')
+    except Exception:
+        # Should have a logging mechanism
+        return None
+
+    # The file is closed even if reading its metadata fails.
+    with nc:
+        try:
+            (datetime_min, datetime_max) = nctime.time_start_end(nc)
+        except Exception:
+            # missing or invalid time units, or unreadable time values
+            # (e.g. a masked first or last value raises TypeError); one
+            # bad file must not stop the crawl
+            return None
+
+        # Add custom facets
+        # In the ESGF implementation, all facets are stored in multivalued
+        # fields, not sure how this is ever used... Not following this
+        # convention here...
+        # All attributes are read at once rather than probed one by one.
+        nc_attrs = nc.__dict__
+        for facet in index_facets_did:
+            if facet + '_id' in nc_attrs:
+                doc[facet] = nc_attrs[facet + '_id'].strip()
+            elif facet in nc_attrs:
+                doc[facet] = nc_attrs[facet].strip()
+
+        # Replica and latest
+        # Setting defaults here, to be modified by other operations.
+        doc['replica'] = False
+        doc['latest'] = True
+
+        # Datetime min/max
+        if datetime_min:
+            # Time zones are not supported by that function...
+            # Plus solr only supports UTC:
+            # https://lucene.apache.org/solr/guide/6_6/working-with-dates.html
+            doc['datetime_min'] = nctime.nc_datetime_to_iso(
+                datetime_min, force_gregorian_date=True) + 'Z'
+        if datetime_max:
+            doc['datetime_max'] = nctime.nc_datetime_to_iso(
+                datetime_max, force_gregorian_date=True) + 'Z'
+
+        if ignored_variables != 'all':
+            variables = []
+            var_attr_values = {bh_attr: []
+                               for bh_attr in birdhouse_solr_attr_mapping}
+            attr_items = tuple(birdhouse_solr_attr_mapping.items())
+            attr_names = frozenset(birdhouse_solr_attr_mapping.values())
+            for (var_name, ncvar) in nc.variables.items():
+                if var_name in ignored_variables:
+                    continue
+                var_attrs = ncvar.__dict__
+                # if there is no standard name, long_name or units,
+                # ignore it
+                if var_attrs.keys().isdisjoint(attr_names):
+                    continue
+                variables.append(var_name)
+                for (bh_attr, attr) in attr_items:
+                    var_attr_values[bh_attr].append(
+                        var_attrs.get(attr, '_undefined').strip())
+            if variables:
+                doc['variable'] = variables
+                doc.update(var_attr_values)
+    return doc
+
+
 def thredds_crawler(thredds_server, index_facets, depth=50,
                     ignored_variables=None, set_dataset_id=False,
                     overwrite_dataset_id=False,
                     wms_alternate_server=None, target_files=None,
-                    ignored_files=None, headers=None, verify=True):
+                    ignored_files=None, headers=None, verify=True,
+                    max_workers=4):
     """Crawl thredds server for metadata.
 
     Parameters
@@ -246,16 +544,25 @@ def thredds_crawler(thredds_server, index_facets, depth=50,
         same rules as target_files but those paths will be ignored.
     headers : headers adds to the thredds client requests
     verify : SSL verification
+    max_workers : int
+        number of processes opening the NetCDF files concurrently
 
     Returns
     -------
-    out : list of dict
+    out : iterator of dict
+        documents are yielded in crawl order, as the datasets are crawled
 
     Notes
     -----
     1. Variables that do not have any of 'standard_name', 'long_name' or
        'units' attributes are ignored. If only one or two of those are
        missing, they are set to '_undefined' in the database.
+    2. MissingThreddsFile is raised once the crawl is over if a target path
+       was not found, after the other documents have been yielded.
+    3. The NetCDF files are opened in max_workers worker processes. On
+       platforms that start processes with spawn (Windows, macOS), the
+       calling script must guard its entry point with
+       ``if __name__ == '__main__':``.
 
     """
 
@@ -266,15 +573,25 @@ def thredds_crawler(thredds_server, index_facets, depth=50,
     elif (not overwrite_dataset_id) and ('dataset_id' not in index_facets):
         index_facets_did.append('dataset_id')
 
+    # Sets are used for the membership tests on each variable of each file.
     if ignored_variables is None:
-        ignored_variables = netcdf_ignored_variables
+        ignored_variables = frozenset(netcdf_ignored_variables)
+    elif ignored_variables != 'all':
+        ignored_variables = frozenset(ignored_variables)
 
-    add_data = []
     targets_found = []
 
+    # Opening the NetCDF files over OPeNDAP is I/O bound, the datasets are
+    # processed concurrently as they are crawled. A bounded number of them
+    # is pending at any time and the documents are yielded in crawl order,
+    # while waiting on a slow file the workers go on with the next ones.
+    # The netCDF-C and HDF5 libraries are not thread-safe, hence the use
+    # of processes rather than threads.
+    pending = collections.deque()
     opendap_hostname = urlparse(thredds_server).hostname
     with netcdfcookie.NetCDFCookie(headers, [opendap_hostname, ],
-                                   verify=verify):
+                                   verify=verify), \
+            ProcessPoolExecutor(max_workers=max_workers) as executor:
         for thredds_dataset in threddsclient.crawl(thredds_server, depth=depth,
                                                    headers=headers,
                                                    verify=verify):
@@ -301,96 +618,19 @@ def thredds_crawler(thredds_server, index_facets, depth=50,
                     continue
                 targets_found.append(target_path)
 
-            wms_url = _modify_wms_url(thredds_dataset, wms_alternate_server)
-            urls = {'opendap_url': thredds_dataset.opendap_url(),
-                    'download_url': thredds_dataset.download_url(),
-                    'thredds_server': thredds_server,
-                    'catalog_url': thredds_dataset.catalog.url,
-                    'wms_url': wms_url}
-            # Here, if opening the NetCDF file fails, we simply continue
-            # to the next one. Perhaps a way to track the erroneous files
-            # should be considered...
-            try:
-                nc = netCDF4.Dataset(urls['opendap_url'], 'r')
-                (datetime_min, datetime_max) = nctime.time_start_end(nc)
-            except:
-                # Should have a logging mechanism
-                continue
-
-            # Default Birdhouse catalog entry
-            # 'url' is used differently in the ESGF database, adding
-            # 'fileserver_url' and will possibly use 'url' as in the ESGF
-            # implementation
-            doc = {'url': urls['download_url'],
-                   'fileserver_url': urls['download_url'],
-                   'source': os.path.join(urls['thredds_server'],
-                                          'catalog.xml'),
-                   'catalog_url': "{0}?dataset={1}".format(
-                       urls['catalog_url'], thredds_dataset.ID),
-                   'category': 'thredds',
-                   'content_type': thredds_dataset.content_type,
-                   'opendap_url': urls['opendap_url'],
-                   'title': thredds_dataset.name,
-                   'last_modified': thredds_dataset.modified,
-                   'wms_url': urls['wms_url'],
-                   'resourcename': thredds_dataset.url_path,
-                   'subject': 'Birdhouse Thredds Catalog',
-                   'type': 'File'}
-
-            # Set default dataset_id
-            if set_dataset_id:
-                doc['dataset_id'] = '.'.join(
-                    doc['resourcename'].split('/')[1:-1])
-
-            # Add custom facets
-            # In the ESGF implementation, all facets are stored in multivalued
-            # fields, not sure how this is ever used... Not following this
-            # convention here...
-            for facet in index_facets_did:
-                if hasattr(nc, facet + '_id'):
-                    doc[facet] = getattr(nc, facet + '_id').strip()
-                elif hasattr(nc, facet):
-                    doc[facet] = getattr(nc, facet).strip()
-
-            # Replica and latest
-            # Setting defaults here, to be modified by other operations.
-            doc['replica'] = False
-            doc['latest'] = True
-
-            # Datetime min/max
-            if datetime_min:
-                # Time zones are not supported by that function...
-                # Plus solr only supports UTC:
-                # https://lucene.apache.org/solr/guide/6_6/working-with-dates.html
-                doc['datetime_min'] = nctime.nc_datetime_to_iso(
-                    datetime_min, force_gregorian_date=True) + 'Z'
-            if datetime_max:
-                doc['datetime_max'] = nctime.nc_datetime_to_iso(
-                    datetime_max, force_gregorian_date=True) + 'Z'
-
-            if ignored_variables != 'all':
-                for var_name in nc.variables:
-                    if var_name in ignored_variables:
-                        continue
-                    ncvar = nc.variables[var_name]
-                    ccf = hasattr(ncvar, 'standard_name')
-                    clong = hasattr(ncvar, 'long_name')
-                    cunits = hasattr(ncvar, 'units')
-                    # if there is no standard name, long_name or units,
-                    # ignore it
-                    if not (ccf or clong or cunits):
-                        continue
-                    if 'variable' not in doc:
-                        doc['variable'] = [var_name]
-                    else:
-                        doc['variable'].append(var_name)
-                    for (bh_attr, attr) in birdhouse_solr_attr_mapping.items():
-                        if bh_attr not in doc:
-                            doc[bh_attr] = []
-                        doc[bh_attr].append(
-                            getattr(ncvar, attr, '_undefined').strip())
-            nc.close()
-            add_data.append(doc)
+            doc = _thredds_dataset_doc(thredds_dataset, thredds_server,
+                                       set_dataset_id, wms_alternate_server)
+            pending.append(executor.submit(
+                _add_netcdf_metadata, doc, index_facets_did,
+                ignored_variables))
+            if len(pending) > 2 * max_workers:
+                doc = pending.popleft().result()
+                if doc is not None:
+                    yield doc
+        while pending:
+            doc = pending.popleft().result()
+            if doc is not None:
+                yield doc
 
     # Check that all target files were found
     if target_files:
@@ -399,14 +639,79 @@ def thredds_crawler(thredds_server, index_facets, depth=50,
             raise MissingThreddsFile(
                 "One or more target path not found: {0}".format(
                     str(list(missing_files))))
-    return add_data
+
+
+def _solr_phrase(value):
+    """Quote a value as a Solr phrase."""
+
+    return '"{0}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def _solr_indexed_sources(solr_server, docs, nrows=1000):
+    """Find the sources already indexed for the title and dataset_id of docs.
+
+    Parameters
+    ----------
+    solr_server : string
+        usually of the form 'http://x.x.x.x:8983/solr/core_name/'
+    docs : list of dictionary
+        documents with 'title' and 'dataset_id' keys
+    nrows : int
+        number of documents returned per page
+
+    Returns
+    -------
+    out : dictionary
+        (title, dataset_id) -> set of sources
+
+    """
+
+    indexed_sources = {}
+    titles = sorted(set(doc['title'] for doc in docs))
+    solr_call = _url_join(solr_server, 'select')
+    # The titles are searched in groups to stay under the Solr limit on the
+    # number of boolean clauses. The parameters are posted since the query
+    # gets too long for a url.
+    for i in range(0, len(titles), 500):
+        query = 'title:({0})'.format(
+            ' OR '.join(_solr_phrase(title) for title in titles[i:i + 500]))
+        cursor = '*'
+        while True:
+            r = _session.post(solr_call, data={
+                'q': query, 'fl': 'title,dataset_id,source', 'rows': nrows,
+                'sort': 'id asc', 'cursorMark': cursor, 'wt': 'json'})
+            if not r.ok:
+                r.raise_for_status()
+            search_dict = _json_loads(r.content)
+            for indexed_doc in search_dict['response']['docs']:
+                key = (indexed_doc.get('title'),
+                       indexed_doc.get('dataset_id'))
+                indexed_sources.setdefault(key, set()).add(
+                    indexed_doc.get('source'))
+            next_cursor = search_dict['nextCursorMark']
+            if next_cursor == cursor:
+                break
+            cursor = next_cursor
+    return indexed_sources
+
+
+def _solr_post_crawled(solr_server, add_raw, add_refresh):
+    # Post a chunk of crawled documents without committing them, returns
+    # the list of Solr responses. The fields of the documents must already
+    # be in the Solr schema.
+    responses = []
+    if add_raw:
+        responses.append(_solr_post_update(solr_server, add_raw))
+    for doc in add_refresh:
+        responses.append(pavicsupdate(solr_server, doc, commit=False))
+    return responses
 
 
 def pavicrawler(thredds_server, solr_server, index_facets, depth=50,
                 ignored_variables=None, set_dataset_id=False,
                 overwrite_dataset_id=False, wms_alternate_server=None,
                 target_files=None, ignored_files=None, check_replica=True,
-                split_update=100, headers=None, verify=True):
+                split_update=500, headers=None, verify=True, max_workers=4):
     """Crawl thredds server and output to Solr database.
 
     Parameters
@@ -445,10 +750,14 @@ def pavicrawler(thredds_server, solr_server, index_facets, depth=50,
         and tag this instance as replica=True if it already exists on
         another thredds server.
     split_update : int
-        how many datasets will be updated per solr request.
+        how many datasets will be updated per solr request, the changes
+        are committed once all the requests are done.
     headers : dict
         headers adds to the thredds client requests
     verify : SSL verification
+    max_workers : int
+        number of processes opening the NetCDF files concurrently, also
+        the number of split_update chunks posted to Solr concurrently
 
     Returns
     -------
@@ -463,60 +772,103 @@ def pavicrawler(thredds_server, solr_server, index_facets, depth=50,
     2. Variables that do not have any of 'standard_name', 'long_name' or
        'units' attributes are ignored. If only one or two of those are
        missing, they are set to '_undefined' in the database.
+    3. The NetCDF files are opened in max_workers worker processes. On
+       platforms that start processes with spawn (Windows, macOS), the
+       calling script must guard its entry point with
+       ``if __name__ == '__main__':``.
 
     """
 
-    add_data = thredds_crawler(thredds_server, index_facets, depth=50,
-                               ignored_variables=ignored_variables,
-                               set_dataset_id=set_dataset_id,
-                               overwrite_dataset_id=overwrite_dataset_id,
-                               wms_alternate_server=wms_alternate_server,
-                               target_files=target_files,
-                               ignored_files=ignored_files,
-                               headers=headers, verify=verify)
+    crawled = thredds_crawler(thredds_server, index_facets, depth=50,
+                              ignored_variables=ignored_variables,
+                              set_dataset_id=set_dataset_id,
+                              overwrite_dataset_id=overwrite_dataset_id,
+                              wms_alternate_server=wms_alternate_server,
+                              target_files=target_files,
+                              ignored_files=ignored_files,
+                              headers=headers, verify=verify,
+                              max_workers=max_workers)
+    if target_files:
+        # All target paths must be found before anything is added to solr.
+        crawled = iter(list(crawled))
 
     solr_response = {'responseHeader':
                      {'QTime': 0, 'status': 0, 'Nquery': 0}}
-    # check for replica
-    if check_replica:
-        add_raw = []
-        add_refresh = []
-        for doc in add_data:
-            (search_dict, search_url) = pavicsearch(
-                solr_server, limit=1000, search_type=None,
-                add_default_min_max=False, query="{0} AND {1}".format(
-                    doc['title'], doc['dataset_id']))
-            if search_dict['response']['docs']:
-                for indexed_doc in search_dict['response']['docs']:
-                    # Here, checking that the free-query above really returned
-                    # exact results for title and dataset_id.
-                    # if dataset_id is not already a key in solr, this will
-                    # return a KeyError... but every entry should have one if
-                    # it was done with the crawler...
-                    if indexed_doc['title'] == doc['title'] and \
-                       indexed_doc['dataset_id'] == doc['dataset_id'] and \
-                       indexed_doc['source'] == doc['source']:
+    schema_fields = solr_schema_fields(solr_server)
+    # Documents are sent to solr in chunks as they are crawled, up to
+    # max_workers chunks are posted concurrently and their responses are
+    # aggregated in crawl order. The changes are committed once at the end.
+    pending = collections.deque()
+    pending_commit = False
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            add_data = list(itertools.islice(crawled, split_update))
+            if not add_data:
+                break
+            add_raw = add_data
+            add_refresh = []
+            # check for replica
+            if check_replica:
+                add_raw = []
+                indexed_sources = _solr_indexed_sources(solr_server,
+                                                        add_data)
+                for doc in add_data:
+                    sources = indexed_sources.get((doc['title'],
+                                                   doc['dataset_id']))
+                    if not sources:
+                        add_raw.append(doc)
+                    elif doc['source'] in sources:
                         add_refresh.append(doc)
-                        break
-                else:
-                    doc['replica'] = True
-                    add_raw.append(doc)
-            else:
-                add_raw.append(doc)
-
-        if add_raw:
-            solr_response = _split_solr_update(solr_server, add_raw,
-                                               split_update)
-        for doc in add_refresh:
-            update_result = pavicsupdate(solr_server, doc)
-            solr_response = aggregate_solr_responses(solr_response,
-                                                     update_result)
-        return solr_response
-    else:
-        if add_data:
-            solr_response = _split_solr_update(solr_server, add_data,
-                                               split_update)
-        return solr_response
+                    else:
+                        doc['replica'] = True
+                        add_raw.append(doc)
+
+            # The schema is only modified here, the worker threads only
+            # post documents.
+            _solr_add_missing_fields(solr_server, add_data, schema_fields)
+            pending.append(executor.submit(_solr_post_crawled, solr_server,
+                                           add_raw, add_refresh))
+            pending_commit = True
+            if len(pending) >= max_workers:
+                for update_result in pending.popleft().result():
+                    solr_response = aggregate_solr_responses(
+                        solr_response, update_result, inplace=True)
+        while pending:
+            for update_result in pending.popleft().result():
+                solr_response = aggregate_solr_responses(
+                    solr_response, update_result, inplace=True)
+    if pending_commit:
+        solr_response = aggregate_solr_responses(solr_response,
+                                                 solr_commit(solr_server),
+                                                 inplace=True)
+    return solr_response
+
+
+def _solr_query_term(term):
+    """Escape and url-quote a term used in a Solr query string.
+
+    Solr syntax characters (including spaces) are backslash-escaped so that
+    the term is searched literally, except for the * and ? wildcards.
+
+    """
+
+    return quote(_solr_special_chars.sub(r'\\\g<0>', term), safe='')
+
+
+def _solr_cursor_page(solr_server, search, nrows, cursor):
+    """Fetch one page of a Solr query using cursor pagination.
+
+    search holds the query parameters, e.g. 'q=*:*&fl=id'.
+
+    """
+
+    my_search = '{0}&rows={1}&sort=id+asc&cursorMark={2}&wt=json'.format(
+        search, str(nrows), quote(cursor))
+    solr_call = _url_join(solr_server, 'select?{0}'.format(my_search))
+    r = _session.get(solr_call)
+    if not r.ok:
+        r.raise_for_status()
+    return _json_loads(r.content)
 
 
 def pavicsvalidate(solr_server, required_facets, limit_paths=None,
@@ -547,75 +899,78 @@ def pavicsvalidate(solr_server, required_facets, limit_paths=None,
         limit_paths = [limit_paths]
     if (limit_files is not None) and (not hasattr(limit_files, 'append')):
         limit_files = [limit_files]
-    # Number of documents returned, this should be larger in deployed
-    # version.
-    nrows = 100
-    n = 0
-    # Note that in Solr, if indexing changes due to document modification,
-    # or new documents, the pagination loop could return the same
-    # document twice or miss a document.
-    # https://cwiki.apache.org/confluence/display/solr/Pagination+of+Results
+    if not required_facets:
+        return []
+    # Number of documents returned per page.
+    nrows = 1000
+    # Deep pagination with a cursor, sorted on the unique key, so that Solr
+    # does not re-execute the query and skip the previous pages each time.
+    # https://lucene.apache.org/solr/guide/6_6/pagination-of-results.html
+    cursor = '*'
     incomplete_docs = []
-    while True:
-        limit_search = ''
-        if limit_paths:
-            limit_search = limit_search + '('
-            for limit_path in limit_paths:
-                limit_search = limit_search + limit_path + '+OR+'
-            limit_search = limit_search[:-4] + ')'
-        if limit_files:
-            if limit_search != '':
-                limit_search = limit_search + '+AND+('
-            else:
-                limit_search = limit_search + '('
-            for limit_file in limit_files:
-                limit_search = limit_search + limit_file + '+OR+'
-            limit_search = limit_search[:-4] + ')'
-        if limit_search != '':
-            my_search = 'q={0}&start={1}&rows={2}&wt=json'.format(
-                limit_search, str(n), str(n + nrows))
-        else:
-            my_search = 'q=*:*&start={0}&rows={1}&wt=json'.format(
-                str(n), str(n + nrows))
-        solr_call = os.path.join(solr_server, 'select?{0}'.format(my_search))
-        r = requests.get(solr_call)
-        if not r.ok:
-            r.raise_for_status()
-        search_dict = r.json()
-        if not len(search_dict['response']['docs']):
-            break
-        for doc in search_dict['response']['docs']:
-            if ('source' not in doc) or ('url' not in doc):
-                continue
-            missing_facets = []
-            for required_facet in required_facets:
-                if required_facet not in doc:
-                    missing_facets.append(required_facet)
+    limit_parts = []
+    if limit_paths:
+        limit_parts.append(
+            '(' + '+OR+'.join(_solr_query_term(path)
+                              for path in limit_paths) + ')')
+    if limit_files:
+        limit_parts.append(
+            '(' + '+OR+'.join(_solr_query_term(name)
+                              for name in limit_files) + ')')
+    limit_search = '+AND+'.join(limit_parts)
+    if not limit_search:
+        limit_search = '*:*'
+    # Let Solr filter the documents that may have missing facets, and only
+    # return the fields needed to tell which ones.
+    facet_filters = []
+    for required_facet in required_facets:
+        facet_filters.append(
+            '(*:* -{0}:[* TO *]) OR {0}:_undefined OR {0}:""'.format(
+                required_facet))
+    filter_search = '(source:[* TO *] AND url:[* TO *]) AND ({0})'.format(
+        ' OR '.join('({0})'.format(f) for f in facet_filters))
+    limit_search = 'q={0}&fq={1}&fl={2}'.format(
+        limit_search, quote(filter_search, safe=''),
+        ','.join(['id', 'source', 'url'] + list(required_facets)))
+    # Each page gives the cursor of the next one, so the next page is
+    # requested in the background while the current one is validated.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        search_dict = _solr_cursor_page(solr_server, limit_search, nrows,
+                                        cursor)
+        while len(search_dict['response']['docs']):
+            next_cursor = search_dict['nextCursorMark']
+            next_page = None
+            if next_cursor != cursor:
+                next_page = executor.submit(_solr_cursor_page, solr_server,
+                                            limit_search, nrows, next_cursor)
+            for doc in search_dict['response']['docs']:
+                if ('source' not in doc) or ('url' not in doc):
                     continue
-                # If it's a list, it must contain values. Those set to
-                # _undefined are considered missing.
-                if hasattr(doc[required_facet], 'append'):
-                    if len(doc[required_facet]) == 0:
-                        missing_facets.append(required_facet)
-                        continue
-                    for value in doc[required_facet]:
-                        if value in ['', '_undefined']:
+                missing_facets = []
+                for required_facet in required_facets:
+                    value = doc.get(required_facet)
+                    # If it's a list, it must contain values. Those that are
+                    # empty strings or set to _undefined are considered
+                    # missing.
+                    if isinstance(value, list):
+                        if (not value) or any(
+                                x in _missing_facet_values for x in value):
                             missing_facets.append(required_facet)
-                            continue
-                # If it's an empty string, it's also considered missing
-                if doc[required_facet] in ['', '_undefined']:
-                    missing_facets.append(required_facet)
-                    continue
-            if missing_facets:
-                incomplete_docs.append({'source': doc['source'],
-                                        'url': doc['url'],
-                                        'id': doc['id'],
-                                        'missing_facets': missing_facets})
-        n += nrows
+                    elif (value is None) or (value in _missing_facet_values):
+                        missing_facets.append(required_facet)
+                if missing_facets:
+                    incomplete_docs.append({'source': doc['source'],
+                                            'url': doc['url'],
+                                            'id': doc['id'],
+                                            'missing_facets': missing_facets})
+            if next_page is None:
+                break
+            cursor = next_cursor
+            search_dict = next_page.result()
     return incomplete_docs
 
 
-def pavicsupdate(solr_server, update_dict):
+def pavicsupdate(solr_server, update_dict, commit=True):
     """Update a Solr entry identified by its id using (key,value) pairs.
 
     Parameters
@@ -624,6 +979,9 @@ def pavicsupdate(solr_server, update_dict):
         usually of the form 'http://x.x.x.x:8983/solr/core_name/'
     update_dict : dictionary
         key:value pairs to update including the id or dataset_id key
+    commit : bool
+        if True, commit the update, otherwise it is left pending until the
+        next Solr commit
 
     Returns
     -------
@@ -637,27 +995,54 @@ def pavicsupdate(solr_server, update_dict):
 
     """
 
-    # Get all the information of the current Solr document
     if 'id' in update_dict:
-        my_search = "q=id:{0}&wt=json".format(update_dict['id'])
-    elif 'dataset_id' in update_dict:
-        my_search = "q=dataset_id:{0}&wt=json".format(
+        doc_ids = [update_dict['id']]
+    else:
+        # Only the ids of the documents of that dataset are needed
+        my_search = "q=dataset_id:{0}&fl=id&wt=json".format(
             update_dict['dataset_id'])
-    solr_call = os.path.join(solr_server, 'select?{0}'.format(my_search))
-    r = requests.get(solr_call)
-    if not r.ok:
-        r.raise_for_status()
-    search_dict = r.json()
-    data = search_dict['response']['docs']
-    # Remove self-generated fields
-    for doc in data:
-        for key in solr_self_generating_fields:
-            doc.pop(key, None)
+        solr_call = _url_join(solr_server, 'select?{0}'.format(my_search))
+        r = _session.get(solr_call)
+        if not r.ok:
+            r.raise_for_status()
+        search_dict = _json_loads(r.content)
+        doc_ids = [doc['id'] for doc in search_dict['response']['docs']]
+    # Atomic updates, Solr only modifies the given fields so the documents
+    # do not have to be fetched and posted back in full.
+    data = []
+    for doc_id in doc_ids:
+        doc = {'id': doc_id}
         for (key, value) in update_dict.items():
             if key == 'id':
                 continue
-            doc[key] = value
-    return solr_update(solr_server, data)
+            doc[key] = {'set': value}
+        data.append(doc)
+    return solr_update(solr_server, data, commit=commit)
+
+
+def _copy_search_result(search_result):
+    # Copy of a Solr search result where the response and its documents are
+    # new dictionaries, the field values themselves are shared.
+    search_result = dict(search_result)
+    if 'response' in search_result:
+        response = dict(search_result['response'])
+        response['docs'] = [dict(doc) for doc in response['docs']]
+        search_result['response'] = response
+    return search_result
+
+
+def _group_docs(docs):
+    # Group Solr documents by dataset_id, in order of first appearance.
+    groups = {}
+    get_group = groups.get
+    for doc in docs:
+        dataset_id = doc['dataset_id']
+        group = get_group(dataset_id)
+        if group is None:
+            groups[dataset_id] = [doc]
+        else:
+            group.append(doc)
+    return groups
 
 
 def datasets_from_solr_search(solr_search_result):
@@ -676,25 +1061,19 @@ def datasets_from_solr_search(solr_search_result):
     """
 
     # The ESGF actually maintains a different solr table for datasets...
-    search_results = copy.deepcopy(solr_search_result)
-    known_datasets = []
-    first_instances = []
-    for i, doc in enumerate(search_results['response']['docs']):
-        if doc['dataset_id'] in known_datasets:
-            continue
-        else:
-            known_datasets.append(doc['dataset_id'])
-            first_instances.append(i)
-            # This is something else in ESGF...
-            # doc['url'] = [doc['url']]
-            doc['type'] = 'Dataset'
-            for key in ['abstract', 'id', 'last_modified', 'resourcename',
-                        'title', 'wms_url', 'catalog_url', 'opendap_url',
-                        'fileserver_url']:
-                doc.pop(key, None)
-    for i in range(len(search_results['response']['docs']) - 1, -1, -1):
-        if i not in first_instances:
-            search_results['response']['docs'].pop(i)
+    search_results = _copy_search_result(solr_search_result)
+    datasets = _group_docs(search_results['response']['docs'])
+    search_results['response']['docs'] = []
+    for dataset_docs in datasets.values():
+        doc = dataset_docs[0]
+        # This is something else in ESGF...
+        # doc['url'] = [doc['url']]
+        doc['type'] = 'Dataset'
+        for key in ['abstract', 'id', 'last_modified', 'resourcename',
+                    'title', 'wms_url', 'catalog_url', 'opendap_url',
+                    'fileserver_url']:
+            doc.pop(key, None)
+        search_results['response']['docs'].append(doc)
     n = len(search_results['response']['docs'])
     search_results['response']['numFound'] = n
     return search_results
@@ -715,34 +1094,26 @@ def aggregate_from_solr_search(solr_search_result):
 
     """
 
-    search_results = copy.deepcopy(solr_search_result)
-    known_datasets = []
-    first_instances = []
-    for i, doc in enumerate(search_results['response']['docs']):
-        # Not sure dataset_id should be used for this purpose, may be
-        # changed in the future...
-        if doc['dataset_id'] in known_datasets:
-            refi = first_instances[known_datasets.index(doc['dataset_id'])]
-            ref_doc = search_results['response']['docs'][refi]
+    search_results = _copy_search_result(solr_search_result)
+    # Not sure dataset_id should be used for this purpose, may be
+    # changed in the future...
+    datasets = _group_docs(search_results['response']['docs'])
+    search_results['response']['docs'] = []
+    for dataset_docs in datasets.values():
+        ref_doc = dataset_docs[0]
+        for attr in ref_doc:
+            if attr in aggregate_solr_fields:
+                ref_doc[attr] = [ref_doc[attr]]
+            elif attr in reduce_solr_fields:
+                # Validate should verify that those are all length 1
+                ref_doc[attr] = ref_doc[attr][0]
+        ref_doc['type'] = 'Aggregate'
+        ref_doc['aggregate_title'] = ref_doc['dataset_id']
+        for doc in dataset_docs[1:]:
             for attr in doc:
                 if attr in aggregate_solr_fields:
                     ref_doc[attr].append(doc[attr])
-        else:
-            # Not sure dataset_id should be used for this purpose, may be
-            # changed in the future...
-            known_datasets.append(doc['dataset_id'])
-            first_instances.append(i)
-            for attr in doc:
-                if attr in aggregate_solr_fields:
-                    doc[attr] = [doc[attr]]
-                elif attr in reduce_solr_fields:
-                    # Validate should verify that those are all length 1
-                    doc[attr] = doc[attr][0]
-            doc['type'] = 'Aggregate'
-            doc['aggregate_title'] = doc['dataset_id']
-    for i in range(len(search_results['response']['docs']) - 1, -1, -1):
-        if i not in first_instances:
-            search_results['response']['docs'].pop(i)
+        search_results['response']['docs'].append(ref_doc)
 
     # reorder based on opendap_url name (or url if not possible)
     # also reduce lists with repeating values for all files
@@ -754,9 +1125,11 @@ def aggregate_from_solr_search(solr_search_result):
         if len(order_attr) == 1:
             doc['type'] = 'FileAsAggregate'
             doc['aggregate_title'] = doc['title'][0]
+        # the sort order is the same for all the attributes
+        order = sorted(range(len(order_attr)), key=order_attr.__getitem__)
         for (attr, value) in doc.items():
-            if hasattr(value, 'append') and (len(value) == len(order_attr)):
-                doc[attr] = [x for (_, x) in sorted(zip(order_attr, value))]
+            if isinstance(value, list) and (len(value) == len(order_attr)):
+                doc[attr] = [value[i] for i in order]
 
     n = len(search_results['response']['docs'])
     search_results['response']['numFound'] = n
@@ -778,12 +1151,12 @@ def file_as_aggregate_from_solr_search(solr_search_result):
 
     """
 
-    search_results = copy.deepcopy(solr_search_result)
+    search_results = _copy_search_result(solr_search_result)
     for doc in search_results['response']['docs']:
         for attr in doc:
             if attr == 'type':
                 continue
-            if not hasattr(doc[attr], 'append'):
+            if not isinstance(doc[attr], list):
                 doc[attr] = [doc[attr]]
         doc['aggregate_title'] = doc['title'][0]
     return search_results
@@ -804,7 +1177,7 @@ def add_default_min_max_to_solr_search(solr_search_result):
 
     """
 
-    search_results = copy.deepcopy(solr_search_result)
+    search_results = _copy_search_result(solr_search_result)
     for doc in search_results['response']['docs']:
         if 'variable' not in doc:
             continue
@@ -835,7 +1208,7 @@ def restructure_urls(solr_search_result):
 
     """
 
-    search_results = copy.deepcopy(solr_search_result)
+    search_results = _copy_search_result(solr_search_result)
     for doc in search_results['response']['docs']:
         for url in doc['url']:
             decode_url = url.split('|')
@@ -858,23 +1231,28 @@ def restructure_urls(solr_search_result):
     return search_results
 
 
+# Conversion of a Solr search result on files for each search_type, other
+# search types are returned as is.
+_search_type_restructure = {
+    'Dataset': datasets_from_solr_search,
+    'Aggregate': aggregate_from_solr_search,
+    'FileAsAggregate': file_as_aggregate_from_solr_search}
+
+
 def restructure_type(search_result, add_default_min_max=True,
                      search_type='File'):
     if add_default_min_max:
         search_result = add_default_min_max_to_solr_search(search_result)
-    if search_type == 'Dataset':
-        search_result = datasets_from_solr_search(search_result)
-    elif search_type == 'Aggregate':
-        search_result = aggregate_from_solr_search(search_result)
-    elif search_type == 'FileAsAggregate':
-        search_result = file_as_aggregate_from_solr_search(search_result)
+    restructure = _search_type_restructure.get(search_type)
+    if restructure is not None:
+        search_result = restructure(search_result)
     return search_result
 
 
 def pavicsearch(solr_server, facets=None, offset=0, limit=10, fields=None,
                 query=None, constraints=None, search_type='File',
                 output_format='application/solr+json',
-                add_default_min_max=True, **kwargs):
+                add_default_min_max=True, cache_timeout=None, **kwargs):
     """Search Solr database.
 
     Parameters
@@ -889,7 +1267,8 @@ def pavicsearch(solr_server, facets=None, offset=0, limit=10, fields=None,
     limit : int
         maximum number of documents to return
     fields : string
-        comma separated list of fields to return
+        comma separated list of fields to return, the fields needed to
+        restructure the result for search_type are also returned
     query : string
         direct query to the Solr database
     constraints : string
@@ -901,6 +1280,9 @@ def pavicsearch(solr_server, facets=None, offset=0, limit=10, fields=None,
         one of 'application/solr+json' or 'application:solr+xml'
     add_default_min_max : bool
         whether to add default color palette information to search result
+    cache_timeout : float
+        number of seconds during which the response to an identical search
+        is reused instead of querying Solr again, None to always query Solr
 
     Returns
     -------
@@ -910,68 +1292,79 @@ def pavicsearch(solr_server, facets=None, offset=0, limit=10, fields=None,
 
     """
 
-    solr_url = os.path.join(solr_server, 'select?')
-    solr_search = ''
+    solr_url = _url_join(solr_server, 'select?')
+    # list of (key, value) since some parameters are repeated
+    solr_params = []
     if facets:
-        solr_search += ("&facet=true"
-                        "&facet.limit=-1"
-                        "&facet.method=enum"
-                        "&facet.mincount=1"
-                        "&facet.sort=lex")
+        solr_params.extend([('facet', 'true'),
+                            ('facet.limit', '-1'),
+                            ('facet.method', 'enum'),
+                            ('facet.mincount', '1'),
+                            ('facet.sort', 'lex')])
         if facets == '*':
             facets = default_facets
         else:
             facets = facets.split(',')
         for facet in facets:
-            solr_search += "&facet.field={0}".format(facet)
-    solr_search += "&start={0}".format(offset)
-    solr_search += "&rows={0}".format(limit)
+            solr_params.append(('facet.field', facet))
+    solr_params.append(('start', offset))
+    solr_params.append(('rows', limit))
     if query is None:
-        solr_search += "&q=*:*"
+        solr_params.append(('q', '*:*'))
     else:
-        solr_search += "&q={0}".format(query)
+        solr_params.append(('q', query))
     if constraints:
-        keys = []
-        vals = []
-        constraints = constraints.split(',')
-        for constraint in constraints:
+        # The values of a facet are combined in a single filter query,
+        # each negated facet has its own filter query.
+        fq_groups = {}
+        for (i, constraint) in enumerate(constraints.split(',')):
             keyval = constraint.split(':')
+            key = keyval[0]
             # The constraint key has to be in the Solr index schema, here
             # the values in default_facets are used as a validation.
-            if keyval[0][-1] == '!':
-                if keyval[0][:-1] not in default_facets:
+            if key[-1] == '!':
+                if key[:-1] not in default_facets:
                     continue
-                keys.append('-{0}'.format(keyval[0][:-1]))
+                key = '-{0}'.format(key[:-1])
+                group = (key, i)
             else:
-                if keyval[0] not in default_facets:
+                if key not in default_facets:
                     continue
-                keys.append(keyval[0])
-            vals.append(keyval[1])
-        for i, key in enumerate(keys):
-            if ((keys.count(key) > 1) and (keys.index(key) != i) and
-                    (key[0] != '-')):
-                continue
-            fq_str = '&fq={0}:"{1}"'.format(key, vals[i])
-            if key[0] != '-':
-                for j, other_key in enumerate(keys[i + 1:]):
-                    if other_key == key:
-                        fq_str += ' || {0}:"{1}"'.format(key, vals[i + j + 1])
-            solr_search += fq_str
+                group = key
+            fq_groups.setdefault(group, []).append(
+                '{0}:"{1}"'.format(key, keyval[1]))
+        for fq_terms in fq_groups.values():
+            solr_params.append(('fq', ' || '.join(fq_terms)))
     if fields:
-        solr_search += "&fl={0},score".format(fields)
+        # the fields used to restructure the search result are always
+        # returned
+        fields = ','.join([fields] + _search_type_fields.get(search_type, []))
+        solr_params.append(('fl', '{0},score'.format(fields)))
     else:
-        solr_search += "&fl=*,score".format(fields)
+        solr_params.append(('fl', '*,score'))
     # For now, all items in the PAVICS solr index are files.
     if search_type:
-        solr_search += "&fq=type:File"
-    solr_search += "&sort=id+asc"
-    solr_search += "&wt=json"
-    solr_search += "&indent=true"
-    solr_search_url = solr_url + solr_search.lstrip('&')
-    r = requests.get(solr_search_url)
-    if not r.ok:
-        r.raise_for_status()
-    solr_result = r.json()
+        solr_params.append(('fq', 'type:File'))
+    solr_params.append(('sort', 'id asc'))
+    solr_params.append(('wt', 'json'))
+    solr_search_url = solr_url + urlencode(solr_params)
+    # The raw response is cached, so that each call parses its own copy.
+    cached = _search_cache.get(solr_search_url)
+    if (cache_timeout and (cached is not None) and
+            (time.monotonic() - cached[0] < cache_timeout)):
+        content = cached[1]
+    else:
+        r = _session.get(solr_search_url)
+        if not r.ok:
+            r.raise_for_status()
+        content = r.content
+        if cache_timeout:
+            _search_cache.pop(solr_search_url, None)
+            if len(_search_cache) >= _search_cache_size:
+                # drop the oldest entry
+                _search_cache.pop(next(iter(_search_cache)), None)
+            _search_cache[solr_search_url] = (time.monotonic(), content)
+    solr_result = _json_loads(content)
     solr_result = restructure_type(solr_result, add_default_min_max,
                                    search_type)
     return (solr_result, solr_search_url)
@@ -1015,7 +1408,7 @@ def esgf_search(esgf_server, facets=None, offset=0, limit=10, fields=None,
 
     """
 
-    esgf_url = os.path.join(esgf_server, 'search?')
+    esgf_url = _url_join(esgf_server, 'search?')
     esgf_search = ''
     # facets (default to not provided)
     if facets:
@@ -1073,14 +1466,27 @@ def esgf_search(esgf_server, facets=None, offset=0, limit=10, fields=None,
     # from
     # to
     esgf_search_url = esgf_url + esgf_search.lstrip('&')
-    r = requests.get(esgf_search_url)
+    r = _session.get(esgf_search_url)
     if not r.ok:
         r.raise_for_status()
-    return (r.json(), esgf_search_url)
+    return (_json_loads(r.content), esgf_search_url)
 
 
-def aggregate_solr_responses(solr_r1, solr_r2):
-    solr_agg = copy.deepcopy(solr_r1)
+def aggregate_solr_responses(solr_r1, solr_r2, inplace=False):
+    # Combine two Solr responses. With inplace, solr_r1 is modified and
+    # returned instead of a copy, for accumulating responses in a loop.
+    if inplace:
+        solr_agg = solr_r1
+    else:
+        solr_agg = _copy_search_result(solr_r1)
+        solr_agg['responseHeader'] = dict(solr_agg['responseHeader'])
+        if 'facet_counts' in solr_agg:
+            # the value and count lists are extended in place
+            facet_counts = dict(solr_agg['facet_counts'])
+            facet_counts['facet_fields'] = {
+                key: list(val)
+                for (key, val) in facet_counts['facet_fields'].items()}
+            solr_agg['facet_counts'] = facet_counts
     # responseHeader
     rheader1 = solr_agg['responseHeader']
     rheader2 = solr_r2['responseHeader']
@@ -1109,13 +1515,15 @@ def aggregate_solr_responses(solr_r1, solr_r2):
             if key in facet_fields1:
                 # assume the value, count pair are always there, is that really
                 # the case?
+                values1 = facet_fields1[key][::2]
                 for i, item in enumerate(val[::2]):
-                    if item in facet_fields1[key]:
-                        facet_fields1[key][2 * i + 1] += val[2 * i + 1]
+                    if item in values1:
+                        j = values1.index(item)
+                        facet_fields1[key][2 * j + 1] += val[2 * i + 1]
                     else:
                         facet_fields1[key].extend([item, val[2 * i + 1]])
             else:
-                facet_fields1[key] = val
+                facet_fields1[key] = list(val)
     return solr_agg
 
 
@@ -1154,7 +1562,8 @@ def pavics_and_esgf_search(solr_servers, esgf_servers,
             (solr_result, search_url) = pavicsearch(
                 solr_server, add_default_min_max=add_default_min_max, **kwargs)
             combined_solr = aggregate_solr_responses(combined_solr,
-                                                     solr_result)
+                                                     solr_result,
+                                                     inplace=True)
     # Forcing search_type to File and reconstructing search type. Should check
     # whether Dataset and Aggregate actually work...
     if 'search_type' in kwargs:
@@ -1175,7 +1584,8 @@ def pavics_and_esgf_search(solr_servers, esgf_servers,
             solr_result = restructure_type(
                 solr_result, add_default_min_max, search_type)
             combined_solr = aggregate_solr_responses(combined_solr,
-                                                     solr_result)
+                                                     solr_result,
+                                                     inplace=True)
     return combined_solr
 
 
@@ -1195,11 +1605,14 @@ def list_of_files_from_pavicsearch(search_result, output_type='opendap_url'):
     """
 
     list_of_files = []
+    append_file = list_of_files.append
+    extend_files = list_of_files.extend
     for doc in search_result['response']['docs']:
-        if output_type not in doc:
+        files = doc.get(output_type)
+        if files is None:
             continue
-        if hasattr(doc[output_type], 'append'):
-            list_of_files.extend(doc[output_type])
+        if isinstance(files, list):
+            extend_files(files)
         else:
-            list_of_files.append(doc[output_type])
+            append_file(files)
     return list_of_files
@@ -1,5 +1,4 @@
 import numpy as np
-from past.builtins import basestring
 import netCDF4
 
 from . import netcdf as pavnc
@@ -67,7 +66,7 @@ def get_point(nc_resource, var_names, ordered_indices=None, named_indices=None,
     # keys that are variable dimensions. keys that do not match a variable
     # dimension are ignored.
 
-    if isinstance(var_names, basestring):
+    if isinstance(var_names, str):
         var_names = [var_names]
 
     if not isinstance(nc_resource, netCDF4._netCDF4.Variable):
@@ -80,7 +79,7 @@ def get_point(nc_resource, var_names, ordered_indices=None, named_indices=None,
 
     # First determine what kind of resource we are dealing with
     tfi = None
-    if isinstance(nc_resource, basestring):
+    if isinstance(nc_resource, str):
         ncdataset = netCDF4.Dataset(nc_resource, 'r')
         ncvars = [ncdataset.variables[x] for x in var_names]
     elif isinstance(nc_resource, netCDF4._netCDF4.Dataset):
@@ -1,4 +1,3 @@
-from past.builtins import basestring
 import netCDF4
 
 from . import geogrid
@@ -25,7 +24,7 @@ def _nearest_lon_lat(nclon, nclat, lon, lat, maximum_distance=None):
 
 
 def nearest_lon_lat(nc_resource, lon, lat, maximum_distance=None):
-    if isinstance(nc_resource, basestring):
+    if isinstance(nc_resource, str):
         ncdataset = netCDF4.Dataset(nc_resource, 'r')
     elif isinstance(nc_resource, netCDF4._netCDF4.Dataset):
         ncdataset = nc_resource
@@ -1,3 +1,4 @@
+import numpy as np
 import netCDF4
 
 
@@ -46,14 +47,34 @@ def ncplotly_from_slice(nc_file, var_name, ti=None, tf=None, levi=None,
                 raise NotImplementedError()
     nctime = nc.variables['time']
     # should allow default calendar
-    datetimes = netCDF4.num2date(nctime[ti:tf], nctime.units, nctime.calendar)
-    datestrings = []
-    for one_datetime in datetimes:
-        datestrings.append(one_datetime.strftime('%Y-%m-%d %H:%M:%S'))
+    datestrings = None
+    if nctime.calendar in ['standard', 'gregorian', 'proleptic_gregorian']:
+        # Real calendars are converted in a single pass with numpy, dates
+        # not representable with python datetimes fall back to cftime.
+        try:
+            datetimes = netCDF4.num2date(
+                nctime[ti:tf], nctime.units, nctime.calendar,
+                only_use_cftime_datetimes=False,
+                only_use_python_datetimes=True)
+        except ValueError:
+            pass
+        else:
+            datetimes = np.asarray(datetimes, dtype='datetime64[s]')
+            datestrings = np.char.replace(
+                np.datetime_as_string(datetimes, unit='s'), 'T', ' ').tolist()
+    if datestrings is None:
+        datetimes = netCDF4.num2date(nctime[ti:tf], nctime.units,
+                                     nctime.calendar)
+        datestrings = []
+        for one_datetime in datetimes:
+            datestrings.append(one_datetime.strftime('%Y-%m-%d %H:%M:%S'))
     # here we assume that it is safe to fallen the resulting slice
     # i.e. that the user made sure the slice result is 1 dimensional in time
+    # masked values are converted to nan
+    values = np.ma.asarray(ncvar[slices], dtype=np.float64)
+    values = np.ma.filled(values, np.nan).ravel()
     d = {'data': [{'x': datestrings,
-                   'y': list(map(float, list(ncvar[slices].flatten()))),
+                   'y': values.tolist(),
                    'type': 'scatter'}],
          'layout': {'title': nc_file,
                     'yaxis': {'title': var_name+' ('+ncvar.units+')'}}}
@@ -2,10 +2,15 @@ import datetime
 import numbers
 
 import numpy as np
-from past.builtins import basestring
 import netCDF4
 
 
+# CF Conventions calendars
+_valid_calendars = frozenset(['gregorian', 'standard', 'proleptic_gregorian',
+                              'noleap', '365_day', 'all_leap', '366_day',
+                              '360_day', 'julian'])
+
+
 def validate_calendar(calendar):
     """Validate calendar string for CF Conventions.
 
@@ -26,8 +31,7 @@ def validate_calendar(calendar):
 
     """
 
-    if calendar in ['gregorian', 'standard', 'proleptic_gregorian', 'noleap',
-                    '365_day', 'all_leap', '366_day', '360_day', 'julian']:
+    if calendar in _valid_calendars:
         return calendar
     elif calendar == 'none':
         raise NotImplementedError("calendar is set to 'none'")
@@ -92,7 +96,7 @@ def get_calendar(nc_resource):
         return validate_calendar(nc_resource.calendar)
     elif isinstance(nc_resource, netCDF4._netCDF4.Dataset):
         return _calendar_from_ncdataset(nc_resource)
-    elif isinstance(nc_resource, basestring):
+    elif isinstance(nc_resource, str):
         nc = netCDF4.Dataset(nc_resource, 'r')
         return _calendar_from_ncdataset(nc)
     else:
@@ -115,7 +119,7 @@ def multiple_files_time_indice(nc_files, t):
 
 
 def _nearest_time_from_netcdf_time_units(nc_files, t, threshold=None):
-    if isinstance(nc_files, basestring):
+    if isinstance(nc_files, str):
         nc_files = [nc_files]
     previous_end_time = None
     previous_nt = None
@@ -175,7 +179,7 @@ def _nearest_time_from_netcdf_time_units(nc_files, t, threshold=None):
 
 
 def nearest_time(nc_files, t, threshold=None):
-    if isinstance(nc_files, basestring):
+    if isinstance(nc_files, str):
         nc_files = [nc_files]
 
     if isinstance(t, (list, set, tuple)):
@@ -184,7 +188,7 @@ def nearest_time(nc_files, t, threshold=None):
                                               t[3], t[4], t[5])
         else:
             t = netCDF4.netcdftime.netcdftime(t[0], t[1], t[2], 12, 0, 0)
-    elif isinstance(t, basestring):
+    elif isinstance(t, str):
         # Can't use time.strptime because of alternate NetCDF calendars
         decode_t = t.split('T')
         decode_date = decode_t[0].split('-')
@@ -273,7 +277,9 @@ def nc_datetime_to_iso(nc_datetime, force_gregorian_date=False,
 
     if force_gregorian_date:
         try:
-            real_datetime = datetime.datetime(*nc_datetime.timetuple()[0:6])
+            real_datetime = datetime.datetime(
+                nc_datetime.year, nc_datetime.month, nc_datetime.day,
+                nc_datetime.hour, nc_datetime.minute, nc_datetime.second)
         except ValueError:
             if raise_non_gregorian_dates:
                 raise
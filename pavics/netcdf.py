@@ -24,6 +24,7 @@ Functions:
 
 """
 
+import re
 import time
 import datetime
 import numpy as np
@@ -31,6 +32,27 @@ import numpy.ma as ma
 import netCDF4
 
 
+# Size of the blocks of data read and written at once when copying variables
+_copy_block_bytes = 32 * 1024 * 1024
+
+# Attributes that change the meaning of the raw values of a variable
+_packing_attrs = ('_FillValue', 'missing_value', 'scale_factor', 'add_offset',
+                  'valid_min', 'valid_max', 'valid_range', '_Unsigned')
+
+# Time units handled without netCDF4.date2num in the gregorian calendar
+_time_units_pattern = re.compile(r'^\s*(\w+)\s+since\s+(.+?)\s*$')
+_seconds_in_unit = {'days': 86400.0, 'day': 86400.0, 'd': 86400.0,
+                    'hours': 3600.0, 'hour': 3600.0, 'h': 3600.0,
+                    'minutes': 60.0, 'minute': 60.0,
+                    'seconds': 1.0, 'second': 1.0, 's': 1.0}
+_gregorian_reform = datetime.datetime(1582, 10, 15)
+
+# CF Conventions calendars
+_valid_calendars = frozenset(['gregorian', 'standard', 'proleptic_gregorian',
+                              'noleap', '365_day', 'all_leap', '366_day',
+                              '360_day', 'julian'])
+
+
 class NetCDFError(Exception):
     pass
 
@@ -58,6 +80,44 @@ def datetimes_to_time_vectors(datetimes):
             return ma.masked_all([6], dtype='int32')
         return one_datetime.timetuple()[0:6]
 
+    if isinstance(datetimes, datetime.datetime):
+        return ma.array(datetimes.timetuple()[0:6])
+
+    # Python datetimes (and None) are converted as a whole with datetime64,
+    # other datetime objects (e.g. non-standard calendars) element-wise.
+    # datetime64 converts timezone-aware datetimes to UTC, so these also go
+    # element-wise to keep their local time.
+    try:
+        aware = any(getattr(one_datetime, 'tzinfo', None) is not None
+                    for one_datetime in datetimes)
+    except TypeError:
+        aware = False
+    try:
+        datetimes64 = None if aware else np.asarray(datetimes,
+                                                    dtype='datetime64[s]')
+    except (TypeError, ValueError):
+        datetimes64 = None
+    if (datetimes64 is not None) and (datetimes64.ndim == 1) and \
+            datetimes64.size:
+        years = datetimes64.astype('datetime64[Y]')
+        months = datetimes64.astype('datetime64[M]')
+        days = datetimes64.astype('datetime64[D]')
+        hours = datetimes64.astype('datetime64[h]')
+        minutes = datetimes64.astype('datetime64[m]')
+        # Column-major, each component is written contiguously
+        time_vectors = np.empty([datetimes64.size, 6], dtype=int, order='F')
+        time_vectors[:, 0] = years.astype(int) + 1970
+        time_vectors[:, 1] = (months - years).astype(int) + 1
+        time_vectors[:, 2] = (days - months).astype(int) + 1
+        time_vectors[:, 3] = (hours - days).astype(int)
+        time_vectors[:, 4] = (minutes - hours).astype(int)
+        time_vectors[:, 5] = (datetimes64 - minutes).astype(int)
+        nat = np.isnat(datetimes64)
+        if nat.any():
+            return ma.array(time_vectors,
+                            mask=np.repeat(nat[:, np.newaxis], 6, axis=1))
+        return ma.array(time_vectors)
+
     try:
         time_tuples = list(map(datetime_timetuple, datetimes))
         return ma.array(time_tuples)
@@ -80,69 +140,35 @@ def time_vectors_to_datetimes(time_vectors):
 
     """
 
-    datetimes = []
+    # Complete the time vectors to (year, month, day, hour, minute, second,
+    # microsecond), rows with any masked value are masked.
+    time_vectors = ma.atleast_2d(ma.asarray(time_vectors))
+    full_vectors = ma.zeros([time_vectors.shape[0], 7], dtype='int32')
+    full_vectors[:, 1:3] = 1
+    full_vectors[:, :time_vectors.shape[1]] = time_vectors
+    masked_rows = ma.getmaskarray(full_vectors).any(axis=1)
+    valid_rows = np.flatnonzero(~masked_rows)
+    full_vectors = full_vectors.filled(0).tolist()
+
+    try:
+        datetimes = [datetime.datetime(*full_vectors[i]) for i in valid_rows]
+    except ValueError:
+        # Not a real calendar date, use netcdftime
+        pass
+    else:
+        return (datetimes, np.flatnonzero(masked_rows), valid_rows)
+
     ncdatetimes = []
-    irregular_calendar = False
-    masked_datetimes = []
-    valid_datetimes = []
-    if len(time_vectors.shape) == 1:
-        full_vector = ma.masked_all([7], dtype='int32')
-        for s in range(time_vectors.shape[0]):
-            full_vector[s] = time_vectors[s]
-        for s in range(time_vectors.shape[0], 7):
-            if s in [1, 2]:
-                full_vector[s] = 1
-            else:
-                full_vector[s] = 0
+    for i in valid_rows:
         try:
-            one_datetime = datetime.datetime(*full_vector)
-        except:
-            irregular_calendar = True
+            ndatetime = netCDF4.netcdftime.datetime(*full_vectors[i])
+            ndatetime.strftime()
+        except ValueError:
+            masked_rows[i] = True
         else:
-            datetimes.append(one_datetime)
-            valid_datetimes.append(0)
-        if irregular_calendar:
-            try:
-                ndatetime = netCDF4.netcdftime.datetime(*full_vector)
-                ndatetime.strftime()
-            except (ma.MaskError, ValueError):
-                masked_datetimes.append(0)
-            else:
-                ncdatetimes.append(ndatetime)
-                valid_datetimes.append(0)
-    else:
-        for i in range(time_vectors.shape[0]):
-            full_vector = ma.masked_all([7], dtype='int32')
-            for s in range(time_vectors.shape[1]):
-                full_vector[s] = time_vectors[i,s]
-            for s in range(time_vectors.shape[1], 7):
-                if s in [1, 2]:
-                    full_vector[s] = 1
-                else:
-                    full_vector[s] = 0
-            try:
-                ndatetime = netCDF4.netcdftime.datetime(*full_vector)
-                ndatetime.strftime()
-            except (ma.MaskError, ValueError):
-                masked_datetimes.append(i)
-            else:
-                ncdatetimes.append(ndatetime)
-                valid_datetimes.append(i)
-            if not irregular_calendar:
-                try:
-                    one_datetime = datetime.datetime(*full_vector)
-                except ValueError:
-                    irregular_calendar = True
-                except ma.MaskError:
-                    pass
-                else:
-                    datetimes.append(one_datetime)
-    if irregular_calendar:
-        return (ncdatetimes, np.array(masked_datetimes),
-                np.array(valid_datetimes))
-    else:
-        return (datetimes, np.array(masked_datetimes),
-                np.array(valid_datetimes))
+            ncdatetimes.append(ndatetime)
+    return (ncdatetimes, np.flatnonzero(masked_rows),
+            np.flatnonzero(~masked_rows))
 
 
 def get_dimensions(nc_resource, var_names=None):
@@ -186,8 +212,7 @@ def validate_calendar(calendar):
 
     """
 
-    if calendar in ['gregorian', 'standard', 'proleptic_gregorian', 'noleap',
-                    '365_day', 'all_leap', '366_day', '360_day', 'julian']:
+    if calendar in _valid_calendars:
         return calendar
     elif calendar == 'none':
         raise NotImplementedError("calendar is set to 'none'")
@@ -254,10 +279,11 @@ def get_calendar(nc_resource):
     else:
         try:
             nc = netCDF4.Dataset(nc_resource, 'r')
-        except:
+        except (OSError, RuntimeError, TypeError):
             raise NetCDFError(("Unknown NetCDF "
                                "resource: %s") % (str(nc_resource),))
-        return _calendar_from_ncdataset(nc)
+        with nc:
+            return _calendar_from_ncdataset(nc)
 
 
 def _get_var_info(ncvar):
@@ -346,48 +372,50 @@ def nc_copy_attrs(nc_source, nc_destination, includes=[], excludes=[],
         appends = {}
     attributes = nc_source.ncattrs()
     if includes:
+        source_attributes = set(attributes)
         for include in includes:
-            if include not in attributes:
+            if include not in source_attributes:
                 raise NotImplementedError("Attribute not found.")
         attributes = includes
+    excludes = set(excludes)
+    # All the attributes are written with a single setncatts call
+    new_attrs = {}
     for attribute in attributes:
-        if attribute not in excludes:
-            if attribute not in renames:
-                renames[attribute] = attribute
-            if renames[attribute] == '_FillValue':
-                continue
-            copy_attr = getattr(nc_source, attribute)
-            # hack for bypassing unicode bug
-            try:
-                copy_attr = copy_attr.encode('latin-1')
-            except (AttributeError, UnicodeEncodeError):
-                pass
-            nc_destination.__setattr__(renames[attribute], copy_attr)
+        if attribute in excludes:
+            continue
+        new_name = renames.get(attribute, attribute)
+        if new_name == '_FillValue':
+            continue
+        copy_attr = getattr(nc_source, attribute)
+        # hack for bypassing unicode bug
+        try:
+            copy_attr = copy_attr.encode('latin-1')
+        except (AttributeError, UnicodeEncodeError):
+            pass
+        new_attrs[new_name] = copy_attr
     for attribute in defaults:
-        if not hasattr(nc_destination, attribute):
+        if (attribute not in new_attrs) and \
+                (not hasattr(nc_destination, attribute)):
             # hack for bypassing unicode bug
             try:
                 default_attr = defaults[attribute].encode('latin-1')
             except (AttributeError, UnicodeEncodeError):
                 default_attr = defaults[attribute]
-            nc_destination.__setattr__(attribute, default_attr)
+            new_attrs[attribute] = default_attr
     for attribute in appends:
-        if hasattr(nc_destination, attribute):
+        # hack for bypassing unicode bug
+        try:
+            append_attr = appends[attribute].encode('latin-1')
+        except (AttributeError, UnicodeEncodeError):
+            append_attr = appends[attribute]
+        if attribute in new_attrs:
+            new_attrs[attribute] = new_attrs[attribute] + '\n' + append_attr
+        elif hasattr(nc_destination, attribute):
             warp = getattr(nc_destination, attribute)
-            # hack for bypassing unicode bug
-            try:
-                append_attr = appends[attribute].encode('latin-1')
-            except (AttributeError, UnicodeEncodeError):
-                append_attr = appends[attribute]
-            new_attr = warp + '\n' + append_attr
-            nc_destination.__setattr__(attribute, new_attr)
+            new_attrs[attribute] = warp + '\n' + append_attr
         else:
-            # hack for bypassing unicode bug
-            try:
-                append_attr = appends[attribute].encode('latin-1')
-            except (AttributeError, UnicodeEncodeError):
-                append_attr = appends[attribute]
-            nc_destination.__setattr__(attribute, append_attr)
+            new_attrs[attribute] = append_attr
+    nc_destination.setncatts(new_attrs)
 
 
 def nc_copy_dimensions(nc_source, nc_destination, includes=[], excludes=[],
@@ -421,12 +449,13 @@ def nc_copy_dimensions(nc_source, nc_destination, includes=[], excludes=[],
     if reshapes is None:
         reshapes = {}
     dims_src = list(nc_source.dimensions)
-    dims_dest = list(nc_destination.dimensions)
+    dims_dest = set(nc_destination.dimensions)
     if includes:
         for include in includes:
-            if include not in dims_src:
+            if include not in nc_source.dimensions:
                 raise NotImplementedError("Dimension not found.")
         dims_src = includes
+    excludes = set(excludes)
     for dim_src in dims_src:
         if dim_src in excludes:
             continue
@@ -474,12 +503,18 @@ def nc_copy_variables_structure(nc_source, nc_destination, includes=[],
     if create_args is None:
         create_args = {}
     vars_src = list(nc_source.variables)
-    vars_dest = list(nc_destination.variables)
+    vars_dest = set(nc_destination.variables)
     if includes:
         for include in includes:
-            if include not in vars_src:
+            if include not in nc_source.variables:
                 raise NotImplementedError("Variable not found.")
         vars_src = includes
+    excludes = set(excludes)
+    # Dimensions with the same size in both files, chunksizes can only be
+    # copied for variables defined on those.
+    dims_match = {name: len(dim) == len(nc_destination.dimensions[name])
+                  for (name, dim) in nc_source.dimensions.items()
+                  if name in nc_destination.dimensions}
     for var_src in vars_src:
         if var_src in excludes:
             continue
@@ -500,21 +535,18 @@ def nc_copy_variables_structure(nc_source, nc_destination, includes=[],
             warp = 'fill_value' not in create_args[var_src]
             if hasattr(ncvar1, '_FillValue') and warp:
                 create_args[var_src]['fill_value'] = ncvar1._FillValue
-            if 'chunksizes' not in create_args[var_src]:
-                # If dimensions size have changed it is not safe to copy
-                # chunksizes.
-                for one_dimension in new_dimensions[var_src]:
-                    source_size = len(nc_source.dimensions[one_dimension])
-                    dest_size = len(nc_destination.dimensions[one_dimension])
-                    if source_size != dest_size:
-                        break
+            # If dimensions size have changed it is not safe to copy
+            # chunksizes.
+            if ('chunksizes' not in create_args[var_src]) and \
+                    all(dims_match.get(one_dimension, False)
+                        for one_dimension in new_dimensions[var_src]):
+                chunking = ncvar1.chunking()
+                if chunking == 'contiguous':
+                    # This does not seem to work, why?
+                    # create_args[var_src]['contiguous'] = True
+                    pass
                 else:
-                    if ncvar1.chunking() == 'contiguous':
-                        # This does not seem to work, why?
-                        # create_args[var_src]['contiguous'] = True
-                        pass
-                    else:
-                        create_args[var_src]['chunksizes'] = ncvar1.chunking()
+                    create_args[var_src]['chunksizes'] = chunking
             nc_destination.createVariable(renames[var_src], new_dtype[var_src],
                                           new_dimensions[var_src],
                                           **create_args[var_src])
@@ -560,12 +592,13 @@ def nc_copy_variables_attributes(nc_source, nc_destination, includes=[],
     if attr_appends is None:
         attr_appends = {}
     vars_src = list(nc_source.variables)
-    vars_dest = list(nc_destination.variables)
+    vars_dest = set(nc_destination.variables)
     if includes:
         for include in includes:
-            if include not in vars_src:
+            if include not in nc_source.variables:
                 raise NotImplementedError("Variable not found in source file.")
         vars_src = includes
+    excludes = set(excludes)
     for var_src in vars_src:
         if var_src in excludes:
             continue
@@ -592,6 +625,63 @@ def nc_copy_variables_attributes(nc_source, nc_destination, includes=[],
                       attr_defaults[var_src], attr_appends[var_src])
 
 
+def _same_packing(ncvar1, ncvar2):
+    # Whether raw values mean the same thing in both variables, i.e. same
+    # type, fill values and packing attributes.
+    if ncvar1.dtype != ncvar2.dtype:
+        return False
+    for attr in _packing_attrs:
+        value1 = getattr(ncvar1, attr, None)
+        value2 = getattr(ncvar2, attr, None)
+        if (value1 is None) != (value2 is None):
+            return False
+        if (value1 is not None) and not np.array_equal(value1, value2):
+            return False
+    return True
+
+
+def _copy_variable_data(ncvar1, ncvar2):
+    # When the raw values can be copied as is, masking and scaling are
+    # turned off to avoid building masks and unpacking/packing the data.
+    if not (isinstance(ncvar1.dtype, np.dtype) and
+            _same_packing(ncvar1, ncvar2)):
+        _copy_variable_blocks(ncvar1, ncvar2)
+        return
+    auto = (ncvar1.mask, ncvar1.scale, ncvar2.mask, ncvar2.scale)
+    ncvar1.set_auto_maskandscale(False)
+    ncvar2.set_auto_maskandscale(False)
+    try:
+        _copy_variable_blocks(ncvar1, ncvar2)
+    finally:
+        ncvar1.set_auto_mask(auto[0])
+        ncvar1.set_auto_scale(auto[1])
+        ncvar2.set_auto_mask(auto[2])
+        ncvar2.set_auto_scale(auto[3])
+
+
+def _copy_variable_blocks(ncvar1, ncvar2):
+    # Copy the data in blocks along the first dimension, so that memory
+    # usage is bounded for large variables. Blocks are aligned with the
+    # source chunks to avoid decompressing them more than once.
+    if (ncvar1.ndim == 0) or not isinstance(ncvar1.dtype, np.dtype):
+        ncvar2[...] = ncvar1[...]
+        return
+    row_size = ncvar1.dtype.itemsize
+    for dim_size in ncvar1.shape[1:]:
+        row_size *= dim_size
+    block = max(_copy_block_bytes // max(row_size, 1), 1)
+    chunking = ncvar1.chunking()
+    if hasattr(chunking, 'append'):
+        block = max(block // chunking[0], 1) * chunking[0]
+    if block >= ncvar1.shape[0]:
+        ncvar2[...] = ncvar1[...]
+        return
+    size = ncvar1.shape[0]
+    for i in range(0, size, block):
+        block_slice = slice(i, min(i + block, size))
+        ncvar2[block_slice] = ncvar1[block_slice]
+
+
 def nc_copy_variables_data(nc_source, nc_destination, includes=[], excludes=[],
                            renames=None, source_slices=None,
                            destination_slices=None):
@@ -614,12 +704,13 @@ def nc_copy_variables_data(nc_source, nc_destination, includes=[], excludes=[],
     if destination_slices is None:
         destination_slices = {}
     vars_src = list(nc_source.variables)
-    vars_dest = list(nc_destination.variables)
+    vars_dest = set(nc_destination.variables)
     if includes:
         for include in includes:
-            if include not in vars_src:
+            if include not in nc_source.variables:
                 raise NotImplementedError("Variable not found in source file.")
         vars_src = includes
+    excludes = set(excludes)
     for var_src in vars_src:
         if var_src in excludes:
             continue
@@ -633,7 +724,23 @@ def nc_copy_variables_data(nc_source, nc_destination, includes=[], excludes=[],
             raise NotImplementedError("Slice copies.")
         if renames[var_src] in destination_slices:
             raise NotImplementedError("Slice copies.")
-        ncvar2[...] = ncvar1[...]
+        _copy_variable_data(ncvar1, ncvar2)
+
+
+def _pick_chunksizes(shape, itemsize, target=1048576):
+    # Chunk sizes of about target bytes, the slowest varying dimensions
+    # are reduced first.
+    chunksizes = [max(size, 1) for size in shape]
+    chunk_bytes = itemsize
+    for size in chunksizes:
+        chunk_bytes *= size
+    for i in range(len(chunksizes)):
+        if chunk_bytes <= target:
+            break
+        other_bytes = chunk_bytes // chunksizes[i]
+        chunksizes[i] = max(target // other_bytes, 1)
+        chunk_bytes = other_bytes * chunksizes[i]
+    return chunksizes
 
 
 def create_dummy_netcdf(nc_file, nc_format='NETCDF4_CLASSIC', use_time=True,
@@ -691,7 +798,7 @@ def create_dummy_netcdf(nc_file, nc_format='NETCDF4_CLASSIC', use_time=True,
     -----
     Features that would make this more flexible in the future:
     1. insert_annual_cycle=True: fake an annual cycle in the data.
-    2. chunksizes
+    2. user defined chunksizes (chunks of about 1 MB are used presently)
     3. stations,yc,xc
     4. missing values
     5. consider rlat and rlon as dimensions
@@ -736,6 +843,13 @@ def create_dummy_netcdf(nc_file, nc_format='NETCDF4_CLASSIC', use_time=True,
     if use_ycxc:
         nc1.createDimension('yc', yc_size)
         nc1.createDimension('xc', xc_size)
+    # Expected dimension sizes, used to choose the chunk sizes
+    dim_sizes = {name: len(dim) for (name, dim) in nc1.dimensions.items()}
+    if use_time and (time_size is None):
+        if time_values is None:
+            dim_sizes['time'] = time_num_values
+        else:
+            dim_sizes['time'] = len(time_values)
 
     # Create netCDF variables
     # Compression parameters include:
@@ -752,7 +866,10 @@ def create_dummy_netcdf(nc_file, nc_format='NETCDF4_CLASSIC', use_time=True,
 
     if use_time:
         # 4.4. Time Coordinate
-        time = nc1.createVariable('time', time_dtype, ('time',), zlib=True)
+        time = nc1.createVariable(
+            'time', time_dtype, ('time',), zlib=True,
+            chunksizes=_pick_chunksizes([dim_sizes['time']],
+                                        np.dtype(time_dtype).itemsize))
         time.axis = 'T'
         time.units = time_units
         time.long_name = 'time'
@@ -760,7 +877,7 @@ def create_dummy_netcdf(nc_file, nc_format='NETCDF4_CLASSIC', use_time=True,
         # 4.4.1. Calendar
         time.calendar = time_calendar
         if time_values is None:
-            time[:] = list(range(time_num_values))
+            time[:] = np.arange(time_num_values, dtype=time_dtype)
         else:
             time[:] = time_values[:]
 
@@ -776,7 +893,9 @@ def create_dummy_netcdf(nc_file, nc_format='NETCDF4_CLASSIC', use_time=True,
 
     if use_lat:
         # 4.1. Latitude Coordinate
-        lat = nc1.createVariable('lat', 'f4', ('lat',), zlib=True)
+        lat = nc1.createVariable(
+            'lat', 'f4', ('lat',), zlib=True,
+            chunksizes=_pick_chunksizes([dim_sizes['lat']], 4))
         lat.axis = 'Y'
         lat.units = 'degrees_north'
         lat.long_name = 'latitude'
@@ -789,7 +908,9 @@ def create_dummy_netcdf(nc_file, nc_format='NETCDF4_CLASSIC', use_time=True,
 
     if use_lon:
         # 4.2. Longitude Coordinate
-        lon = nc1.createVariable('lon', 'f4', ('lon',), zlib=True)
+        lon = nc1.createVariable(
+            'lon', 'f4', ('lon',), zlib=True,
+            chunksizes=_pick_chunksizes([dim_sizes['lon']], 4))
         lon.axis = 'X'
         lon.units = 'degrees_east'
         lon.long_name = 'longitude'
@@ -872,8 +993,11 @@ def create_dummy_netcdf(nc_file, nc_format='NETCDF4_CLASSIC', use_time=True,
     if use_ycxc:
         var_dims.append('yc')
         var_dims.append('xc')
+    var_chunksizes = _pick_chunksizes([dim_sizes[dim] for dim in var_dims],
+                                      np.dtype(var_dtype).itemsize)
     var1 = nc1.createVariable(var_name, var_dtype, tuple(var_dims), zlib=True,
-                              chunksizes=None,
+                              complevel=4, shuffle=True,
+                              chunksizes=var_chunksizes,
                               fill_value=netCDF4.default_fillvals[var_dtype])
     # 3.1. Units
     var1.units = '1'
@@ -882,25 +1006,27 @@ def create_dummy_netcdf(nc_file, nc_format='NETCDF4_CLASSIC', use_time=True,
     # 3.3. Standard Name
     var1.standard_name = 'dummy_variable'
 
+    num_values = var1.size
+    masked_values = 0
+    data_size_mb = var1.size*var1.dtype.itemsize/1000000.0
+    # Generated data is single precision for single precision variables
+    if var_dtype == 'f4':
+        data_dtype = np.float32
+    else:
+        data_dtype = np.float64
     if fill_mode == 'random':
-        data1 = np.random.rand(*var1.shape)*data_scale_factor+data_add_offset
-        num_values = data1.size
-        if hasattr(data1, 'count'):
-            masked_values = num_values-data1.count()
-        else:
-            masked_values = 0
+        rng = np.random.default_rng()
+        data1 = rng.random(var1.shape, dtype=data_dtype)
+        data1 *= data_scale_factor
+        data1 += data_add_offset
         data_size_mb = data1.nbytes/1000000.0
-        var1[...] = data1[...]
+        var1[...] = data1
     elif fill_mode == 'gradient':
-        data1 = np.arange(0, 1.0+0.5/(var1.size-1), 1.0/(var1.size-1))
-        data1 = data1*data_scale_factor+data_add_offset
-        num_values = data1.size
-        if hasattr(data1, 'count'):
-            masked_values = num_values-data1.count()
-        else:
-            masked_values = 0
+        data1 = np.linspace(0.0, 1.0, var1.size, dtype=data_dtype)
+        data1 *= data_scale_factor
+        data1 += data_add_offset
         data_size_mb = data1.nbytes/1000000.0
-        var1[...] = ma.reshape(data1, var1.shape)
+        var1[...] = data1.reshape(var1.shape)
     elif fill_mode == 'pairing':
         data1 = np.zeros(var1.shape)
         dim = -1
@@ -941,7 +1067,8 @@ def period2indices(initial_date, final_date, nc_file, calendar=None):
         format must be %Y-%m-%dT%H:%M:%S
     final_date : string
         format must be %Y-%m-%dT%H:%M:%S
-    nc_file : string
+    nc_file : string or netCDF4.Dataset
+        an open dataset is used as is and left open
     calendar : string
         default is gregorian calendar
 
@@ -966,7 +1093,35 @@ def period2indices(initial_date, final_date, nc_file, calendar=None):
     initial_time = time.strptime(initial_date, '%Y-%m-%dT%H:%M:%S')
     final_time = time.strptime(final_date, '%Y-%m-%dT%H:%M:%S')
 
-    nc = netCDF4.Dataset(nc_file, 'r')
+    if hasattr(nc_file, 'variables'):
+        return _period2indices(initial_time, final_time, nc_file, calendar)
+    with netCDF4.Dataset(nc_file, 'r') as nc:
+        return _period2indices(initial_time, final_time, nc, calendar)
+
+
+def _gregorian_date2num(datetimes, units):
+    # date2num for datetimes after the gregorian calendar reform, with
+    # 'units since yyyy-mm-dd[ hh:mm:ss]' time units. Returns None if this
+    # does not apply and date2num should be used.
+    match = _time_units_pattern.match(units)
+    if (match is None) or (match.group(1).lower() not in _seconds_in_unit):
+        return None
+    try:
+        epoch = datetime.datetime.strptime(match.group(2).replace('T', ' '),
+                                           '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        try:
+            epoch = datetime.datetime.strptime(match.group(2), '%Y-%m-%d')
+        except ValueError:
+            return None
+    if min([epoch] + list(datetimes)) < _gregorian_reform:
+        return None
+    seconds = _seconds_in_unit[match.group(1).lower()]
+    return [(one_datetime - epoch).total_seconds() / seconds
+            for one_datetime in datetimes]
+
+
+def _period2indices(initial_time, final_time, nc, calendar):
     if 'time' not in nc.variables:
         raise NetCDFError("No time variable in the NetCDF file.")
     nctime = nc.variables['time']
@@ -1003,10 +1158,23 @@ def period2indices(initial_date, final_date, nc_file, calendar=None):
                                                    final_time.tm_hour,
                                                    final_time.tm_min,
                                                    final_time.tm_sec)
-    index_ini = netCDF4.date2index(initial_nctime, nctime, calendar=calendar,
-                                   select='after')
-    index_fin = netCDF4.date2index(final_nctime, nctime, calendar=calendar,
-                                   select='before')
+    # The period bounds are converted to the time units, then searched in
+    # the (increasing) time values.
+    times = nctime[:]
+    nums = None
+    if calendar in ['gregorian', 'standard']:
+        nums = _gregorian_date2num([initial_nctime, final_nctime],
+                                   nctime.units)
+    if nums is None:
+        nums = netCDF4.date2num([initial_nctime, final_nctime],
+                                nctime.units, calendar=calendar)
+    (num_ini, num_fin) = nums
+    index_ini = int(np.searchsorted(times, num_ini, side='left'))
+    index_fin = int(np.searchsorted(times, num_fin, side='right')) - 1
+    if index_ini == len(times):
+        raise ValueError("Initial date is after the last time value.")
+    if index_fin < 0:
+        raise ValueError("Final date is before the first time value.")
     return {'initial_index': index_ini, 'final_index': index_fin}
 
 
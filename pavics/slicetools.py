@@ -21,7 +21,6 @@ Slice synthax reminder: slice([start,] stop[, step])
 """
 
 import numpy as np
-from past.builtins import basestring
 
 
 class SliceError(Exception):
@@ -267,8 +266,8 @@ def divide_slices_for_memory_fit(shape, dtype, slices=None, dimensions=None,
                     n += np.ceil((stop-start)/float(step))
                 else:
                     n += shape[i]
-            for i, key in enumerate(dimensions.keys()):
-                if key not in list(slices.keys()):
+            for i, key in enumerate(dimensions):
+                if key not in slices:
                     n += shape[i]
         else:
             n = 0
@@ -292,14 +291,14 @@ def divide_slices_for_memory_fit(shape, dtype, slices=None, dimensions=None,
         num_divisions = _num_divisions_for_memory_fit(n, dtype, memory_size)
     if divide_dimension is None:
         return divide_slices(shape, num_divisions, slices, dimensions)
-    elif isinstance(divide_dimension, basestring):
+    elif isinstance(divide_dimension, str):
         return divide_slices(shape, {divide_dimension: num_divisions}, slices,
                              dimensions)
     elif isinstance(divide_dimension, list):
         divisions_list = [1]*len(shape)
         valid_divs = []
         for div in divide_dimension:
-            if isinstance(div, basestring):
+            if isinstance(div, str):
                 valid_divs.append(dimensions.index(div))
             else:
                 valid_divs.append(div)
@@ -12,14 +12,14 @@ class TestTimely(unittest.TestCase):
                                  12:'December'}
         self.temperate_seasons = {1:'Spring',2:'Summer',3:'Autumn',4:'Winter'}
         self.year_cycle = {1:'Year'}
-        self.days28 = [1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,
-                       22,23,24,25,26,27,28]
-        self.days29 = [1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,
-                       22,23,24,25,26,27,28,29]
-        self.days30 = [1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,
-                       22,23,24,25,26,27,28,29,30]
-        self.days31 = [1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,
-                       22,23,24,25,26,27,28,29,30,31]
+        self.days28 = (1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,
+                       22,23,24,25,26,27,28)
+        self.days29 = (1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,
+                       22,23,24,25,26,27,28,29)
+        self.days30 = (1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,
+                       22,23,24,25,26,27,28,29,30)
+        self.days31 = (1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,
+                       22,23,24,25,26,27,28,29,30,31)
         self.arbitrary_years = [-10000,-4966,-1,0,400,1878,1900,2000,2660,9999]
         self.never_leap_years = [-1774,1,890,1962,2711]
 
@@ -47,6 +47,24 @@ class TestTimely(unittest.TestCase):
                            ty.is_leap_feb29)
         self.assertEqual(cal1,cal2)
 
+    def test_calendar_hash(self):
+        cal1 = ty.Calendar('some_name',ty.year_cycle,ty.day_in_year,
+                           ty.is_leap_feb29)
+        cal2 = ty.Calendar('some_name',ty.year_cycle,ty.day_in_year,
+                           ty.is_leap_feb29)
+        self.assertEqual(hash(cal1),hash(cal2))
+        self.assertEqual(len(set([cal1,cal2,ty.Cal360])),2)
+        self.assertNotEqual(cal1,'some_name')
+
+    def test_calendar_year_length_cache(self):
+        # A calendar reusing an alias must not get the cached year length
+        # of the built-in calendar.
+        self.assertEqual(ty.Cal360.count_days_in_year(2001),360)
+        cal = ty.Calendar('360_day',ty.months_of_gregorian_calendar,
+                          ty.days_in_month_366,ty.Cal360.fn_is_leap)
+        self.assertEqual(cal.count_days_in_year(2001),366)
+        self.assertEqual(ty.Cal360.count_days_in_year(2001),360)
+
     def test_calendar_ne(self):
         cal1 = ty.Calendar('some_name',ty.year_cycle,ty.day_in_year,
                            ty.is_leap_feb29)
@@ -54,6 +72,12 @@ class TestTimely(unittest.TestCase):
                            ty.is_leap_feb29)
         self.assertNotEqual(cal1,cal2)
 
+    def test_calendar_from_alias(self):
+        self.assertIs(ty.calendar_from_alias('standard'),ty.CalGregorian)
+        self.assertIs(ty.calendar_from_alias('365_day'),ty.Cal365)
+        self.assertIs(ty.calendar_from_alias('all_leap'),ty.Cal366)
+        self.assertRaises(ty.CalendarError,ty.calendar_from_alias,'unknown')
+
     def test_cal360_days(self):
         for year in self.arbitrary_years + self.never_leap_years:
             for month in range(1,13):
@@ -253,8 +277,27 @@ class TestTimely(unittest.TestCase):
         days = ty.CalGregorian.days_in_cycle(12,1000)
         self.assertEqual(days,self.days31)
         days = ty.CalGregorian.days_in_cycle(10,1582)
-        self.assertEqual(days,[1,2,3,4,15,16,17,18,19,20,21,22,23,24,25,
-                               26,27,28,29,30,31])
+        self.assertEqual(days,(1,2,3,4,15,16,17,18,19,20,21,22,23,24,25,
+                               26,27,28,29,30,31))
+
+    def test_month_table_for_year(self):
+        table = ty.month_table_for_year(1582)
+        self.assertEqual(len(table),12)
+        self.assertEqual(table[9],(1,2,3,4,15,16,17,18,19,20,21,22,23,24,25,
+                                   26,27,28,29,30,31))
+        self.assertEqual(table[10],self.days30)
+        self.assertEqual(ty.month_table_for_year(1900)[1],self.days28)
+        self.assertEqual(ty.month_table_for_year(1100)[1],self.days29)
+
+    def test_days_in_month_gregorian_vec(self):
+        months = [1,2,2,2,2,6,10,10,12]
+        years = [1964,1100,1900,1964,2000,1900,1582,1583,2000]
+        days = ty.days_in_month_gregorian_vec(months,years)
+        self.assertEqual(days.tolist(),[31,29,28,29,29,30,21,31,31])
+        self.assertEqual(ty.days_in_month_gregorian_vec(2,2000),29)
+        self.assertEqual(ty.days_in_month_gregorian_vec(10,1582),21)
+        days = ty.days_in_month_gregorian_vec(2,[1900,2000])
+        self.assertEqual(days.tolist(),[28,29])
 
     def test_calgregorian_is_leap(self):
         for year in self.never_leap_years:
@@ -285,6 +328,24 @@ class TestTimely(unittest.TestCase):
         self.assertEqual(days_in_year,366)
         days_in_year = ty.CalGregorian.count_days_in_year(1000)
         self.assertEqual(days_in_year,366)
+        days_in_year = ty.CalGregorian.count_days_in_year(1582)
+        self.assertEqual(days_in_year,355)
+        days_in_year = ty.CalGregorian.count_days_in_year(1581)
+        self.assertEqual(days_in_year,365)
+
+    def test_calgregorian_is_leap_array(self):
+        years = [1000,1100,1582,1900,1964,2000] + self.never_leap_years
+        flags = ty.CalGregorian.is_leap_array(years)
+        self.assertEqual(flags.tolist(),
+                         [ty.CalGregorian.is_leap(year) for year in years])
+        self.assertRaises(ty.CalendarError,ty.CalSeasons.is_leap_array,
+                          years)
+
+    def test_calgregorian_count_days_in_year_array(self):
+        years = [1000,1100,1581,1582,1900,1964,2000]
+        days_in_year = ty.CalGregorian.count_days_in_year_array(years)
+        self.assertEqual(days_in_year.tolist(),
+                         [366,366,365,355,365,366,366])
 
     def test_calyearsonly_days(self):
         for year in self.arbitrary_years + self.never_leap_years:
@@ -320,6 +381,10 @@ class TestTimely(unittest.TestCase):
                 days = ty.CalSeasons.days_in_cycle(season,year)
                 self.assertEqual(days,[1])
 
+    def test_temperate_seasons_names(self):
+        self.assertEqual(ty.temperate_seasons,self.temperate_seasons)
+        self.assertEqual(ty.seasons_of_year(),(1,2,3,4))
+
     def test_calseasons_is_leap(self):
         for year in self.arbitrary_years + self.never_leap_years:
             self.assertRaises(ty.CalendarError,ty.CalSeasons.is_leap,0)
@@ -0,0 +1,238 @@
+import unittest
+import os
+import copy
+import json
+import threading
+from unittest import mock
+from urllib.parse import parse_qsl, quote, urlparse
+
+import netCDF4
+import numpy.ma as ma
+
+import pavics.catalog as cat
+
+
+def solr_result(docs, facet_fields=None):
+    result = {'responseHeader': {'status': 0, 'QTime': 3},
+              'response': {'numFound': len(docs), 'start': 0, 'docs': docs}}
+    if facet_fields is not None:
+        result['facet_counts'] = {'facet_fields': facet_fields}
+    return result
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.dummy_file_1 = 'dummy_catalog_file_1.nc'
+        self.docs = []
+        for (i, did) in enumerate(['d1', 'd2', 'd1', 'd1']):
+            self.docs.append(
+                {'id': 'f{0}'.format(i), 'dataset_id': did,
+                 'title': 'f{0}.nc'.format(i), 'url': 'u{0}'.format(3 - i),
+                 'opendap_url': 'o{0}'.format(3 - i),
+                 'variable': ['tas'], 'units': ['K'], 'type': 'File'})
+
+    def tearDown(self):
+        if os.path.isfile(self.dummy_file_1):
+            os.remove(self.dummy_file_1)
+
+    def test_add_netcdf_metadata_masked_time(self):
+        with netCDF4.Dataset(self.dummy_file_1, 'w') as nc:
+            nc.createDimension('time', 3)
+            nctime = nc.createVariable('time', 'f8', ('time',))
+            nctime.units = 'days since 2001-01-01 00:00:00'
+            nctime[:] = ma.array([0, 1, 2], mask=[0, 0, 1])
+        # the file is skipped instead of stopping the crawl
+        doc = cat._add_netcdf_metadata({'opendap_url': self.dummy_file_1},
+                                       [], [])
+        self.assertIsNone(doc)
+
+    def test_group_docs(self):
+        groups = cat._group_docs(self.docs)
+        self.assertEqual(list(groups), ['d1', 'd2'])
+        self.assertEqual([doc['id'] for doc in groups['d1']],
+                         ['f0', 'f2', 'f3'])
+        self.assertTrue(groups['d2'][0] is self.docs[1])
+
+    def test_datasets_from_solr_search(self):
+        result = solr_result(self.docs)
+        before = copy.deepcopy(result)
+        datasets = cat.datasets_from_solr_search(result)
+        self.assertEqual(result, before)
+        self.assertEqual(datasets['response']['numFound'], 2)
+        self.assertEqual([doc['dataset_id'] for doc
+                          in datasets['response']['docs']], ['d1', 'd2'])
+        for doc in datasets['response']['docs']:
+            self.assertEqual(doc['type'], 'Dataset')
+            self.assertNotIn('title', doc)
+
+    def test_aggregate_from_solr_search(self):
+        result = solr_result(self.docs)
+        before = copy.deepcopy(result)
+        aggregates = cat.aggregate_from_solr_search(result)
+        self.assertEqual(result, before)
+        (agg1, agg2) = aggregates['response']['docs']
+        self.assertEqual(agg1['type'], 'Aggregate')
+        self.assertEqual(agg1['aggregate_title'], 'd1')
+        # files sorted on opendap_url
+        self.assertEqual(agg1['opendap_url'], ['o0', 'o1', 'o3'])
+        self.assertEqual(agg1['title'], ['f3.nc', 'f2.nc', 'f0.nc'])
+        self.assertEqual(agg1['units'], 'K')
+        self.assertEqual(agg2['type'], 'FileAsAggregate')
+        self.assertEqual(agg2['aggregate_title'], 'f1.nc')
+
+    def test_file_as_aggregate_from_solr_search(self):
+        result = solr_result(self.docs)
+        before = copy.deepcopy(result)
+        aggregates = cat.file_as_aggregate_from_solr_search(result)
+        self.assertEqual(result, before)
+        doc = aggregates['response']['docs'][0]
+        self.assertEqual(doc['title'], ['f0.nc'])
+        self.assertEqual(doc['variable'], ['tas'])
+        self.assertEqual(doc['type'], 'File')
+
+    def test_add_default_min_max_to_solr_search(self):
+        result = solr_result(self.docs)
+        before = copy.deepcopy(result)
+        with_min_max = cat.add_default_min_max_to_solr_search(result)
+        self.assertEqual(result, before)
+        doc = with_min_max['response']['docs'][0]
+        self.assertEqual(doc['variable_min'], [253.15])
+        self.assertEqual(doc['variable_palette'], ['div-BuRd'])
+
+    def test_aggregate_solr_responses(self):
+        r1 = solr_result(self.docs[:2], {'model': ['a', 2, 'b', 1]})
+        r2 = solr_result(self.docs[2:], {'model': ['b', 3, 'c', 1],
+                                         'project': ['p', 2]})
+        (before1, before2) = (copy.deepcopy(r1), copy.deepcopy(r2))
+        agg = cat.aggregate_solr_responses(r1, r2)
+        self.assertEqual(r1, before1)
+        self.assertEqual(r2, before2)
+        self.assertEqual(agg['responseHeader']['Nquery'], 2)
+        self.assertEqual(agg['responseHeader']['QTime'], 6)
+        self.assertEqual(agg['response']['numFound'], 4)
+        self.assertEqual([doc['id'] for doc in agg['response']['docs']],
+                         ['f0', 'f1', 'f2', 'f3'])
+        facet_fields = agg['facet_counts']['facet_fields']
+        self.assertEqual(facet_fields['model'], ['a', 2, 'b', 4, 'c', 1])
+        self.assertEqual(facet_fields['project'], ['p', 2])
+        facet_fields['project'].append('q')
+        self.assertEqual(r2, before2)
+
+    def test_aggregate_solr_responses_inplace(self):
+        r1 = solr_result(self.docs[:2])
+        r2 = solr_result(self.docs[2:])
+        before2 = copy.deepcopy(r2)
+        agg = cat.aggregate_solr_responses(r1, r2, inplace=True)
+        self.assertTrue(agg is r1)
+        self.assertEqual(r1['response']['numFound'], 4)
+        self.assertEqual(r1['responseHeader']['Nquery'], 2)
+        self.assertEqual(r2, before2)
+
+    def test_solr_query_term(self):
+        self.assertEqual(cat._solr_query_term('a b:c/d'),
+                         quote('a\\ b\\:c\\/d', safe=''))
+        self.assertEqual(cat._solr_query_term('(x)'),
+                         quote('\\(x\\)', safe=''))
+        # wildcards are left to Solr
+        self.assertEqual(cat._solr_query_term('tas*_?.nc'),
+                         quote('tas*_?.nc', safe=''))
+
+    def _search_params(self, **kwargs):
+        response = mock.Mock(ok=True, content=b'{"response": {"docs": []}}')
+        with mock.patch.object(cat, '_session') as session:
+            session.get.return_value = response
+            (result, url) = cat.pavicsearch('http://x/solr/core',
+                                            search_type=None, **kwargs)
+        self.assertEqual(session.get.call_args[0][0], url)
+        self.assertEqual(urlparse(url).path, '/solr/core/select')
+        return parse_qsl(urlparse(url).query)
+
+    def test_pavicsearch_filter_queries(self):
+        params = self._search_params(
+            constraints='model:CRCM4,experiment:rcp85,model:CRCM5,'
+                        'unknown:x,project!:CMIP5,project!:CORDEX')
+        fq = [val for (key, val) in params if key == 'fq']
+        self.assertEqual(fq, ['model:"CRCM4" || model:"CRCM5"',
+                              'experiment:"rcp85"',
+                              '-project:"CMIP5"',
+                              '-project:"CORDEX"'])
+        self.assertIn(('q', '*:*'), params)
+
+    def test_pavicsearch_fields(self):
+        params = dict(self._search_params(fields='id'))
+        self.assertEqual(params['fl'], 'id,score')
+        params = dict(self._search_params(facets='model,project'))
+        self.assertEqual(params['fl'], '*,score')
+        self.assertEqual(params['facet'], 'true')
+
+    def _fake_post(self, posted, last_id):
+        # The first batch is only answered once the batch holding last_id
+        # is posted, so that the batches complete out of order.
+        last_posted = threading.Event()
+
+        def post(url, data, headers):
+            update = cat._json_loads(data)
+            posted.append((url, update))
+            ids = []
+            if not url.endswith('/update'):
+                ids = [doc['id'] for doc in update]
+                if last_id in ids:
+                    last_posted.set()
+                elif 'f0' in ids:
+                    self.overlapped = last_posted.wait(2)
+            content = {'responseHeader': {'status': 0, 'QTime': 1},
+                       'response': {'numFound': len(ids), 'docs': ids}}
+            return mock.Mock(ok=True, content=json.dumps(content).encode())
+
+        return post
+
+    def test_solr_update_batches(self):
+        docs = [{'id': 'f{0}'.format(i)} for i in range(5)]
+        posted = []
+        with mock.patch.object(cat, '_session') as session:
+            session.post.side_effect = self._fake_post(posted, 'f4')
+            result = cat.solr_update('http://x/solr/core', docs,
+                                     batch_size=2, schema_fields={'id'})
+        updates = [update for (url, update) in posted
+                   if url.endswith('/update/json?commit=false')]
+        self.assertEqual(sorted(len(update) for update in updates),
+                         [1, 2, 2])
+        # a single commit, once all the batches are posted
+        self.assertEqual([url for (url, update) in posted
+                          if url.endswith('/update')],
+                         ['http://x/solr/core/update'])
+        self.assertEqual(posted[-1][1], {'commit': {}})
+        # responses aggregated in batch order
+        self.assertEqual(result['response']['docs'],
+                         ['f0', 'f1', 'f2', 'f3', 'f4'])
+        self.assertEqual(result['response']['numFound'], 5)
+        self.assertEqual(result['responseHeader']['Nquery'], 4)
+        self.assertTrue(self.overlapped)
+
+    def test_pavicrawler_posts_chunks(self):
+        docs = [{'id': 'f{0}'.format(i)} for i in range(5)]
+        posted = []
+        with mock.patch.object(cat, '_session') as session, \
+                mock.patch.object(cat, 'thredds_crawler',
+                                  return_value=iter(docs)), \
+                mock.patch.object(cat, 'solr_schema_fields',
+                                  return_value={'id'}):
+            session.post.side_effect = self._fake_post(posted, 'f4')
+            result = cat.pavicrawler('http://x/thredds',
+                                     'http://x/solr/core', [],
+                                     check_replica=False, split_update=2)
+        updates = [update for (url, update) in posted
+                   if url.endswith('/update/json?commit=false')]
+        self.assertEqual(sorted(len(update) for update in updates),
+                         [1, 2, 2])
+        self.assertEqual(posted[-1],
+                         ('http://x/solr/core/update', {'commit': {}}))
+        self.assertEqual(len(posted), 4)
+        self.assertEqual(result['responseHeader']['Nquery'], 4)
+        self.assertTrue(self.overlapped)
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestCatalog)
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -1,5 +1,8 @@
 import unittest
 import os
+import datetime
+
+import numpy.ma as ma
 
 import pavics.netcdf as pavnc
 
@@ -23,6 +26,34 @@ class TestNetCDF(unittest.TestCase):
         self.assertEqual(d['initial_index'], 1)
         self.assertEqual(d['final_index'], 30)
 
+    def test_datetimes_to_time_vectors_01(self):
+        tv = pavnc.datetimes_to_time_vectors(
+            [datetime.datetime(2001, 2, 3, 4, 5, 6), None,
+             datetime.datetime(1850, 12, 31, 23, 59, 59)])
+        self.assertEqual(tv.shape, (3, 6))
+        self.assertEqual(tv[0].tolist(), [2001, 2, 3, 4, 5, 6])
+        self.assertTrue(tv.mask[1].all())
+        self.assertEqual(tv[2].tolist(), [1850, 12, 31, 23, 59, 59])
+
+    def test_datetimes_to_time_vectors_02(self):
+        # timezone-aware datetimes keep their local time
+        tz = datetime.timezone(datetime.timedelta(hours=5))
+        tv = pavnc.datetimes_to_time_vectors(
+            [datetime.datetime(2000, 1, 1, 3, tzinfo=tz), None,
+             datetime.datetime(2000, 1, 1, 3)])
+        self.assertEqual(tv[0].tolist(), [2000, 1, 1, 3, 0, 0])
+        self.assertTrue(tv.mask[1].all())
+        self.assertEqual(tv[2].tolist(), [2000, 1, 1, 3, 0, 0])
+
+    def test_time_vectors_to_datetimes_01(self):
+        tv = ma.array([[2001, 2, 3], [2001, 2, 4], [2001, 2, 5]],
+                      mask=[[0, 0, 0], [0, 1, 0], [0, 0, 0]])
+        (datetimes, masked, valid) = pavnc.time_vectors_to_datetimes(tv)
+        self.assertEqual(datetimes, [datetime.datetime(2001, 2, 3),
+                                     datetime.datetime(2001, 2, 5)])
+        self.assertEqual(masked.tolist(), [1])
+        self.assertEqual(valid.tolist(), [0, 2])
+
 suite = unittest.TestLoader().loadTestsFromTestCase(TestNetCDF)
 
 if __name__ == '__main__':